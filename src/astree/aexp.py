@@ -11,24 +11,19 @@ Sources
 
 """
 
-from anytree import AnyNode
+import operator
 
+from astree.node import Node
 
-class AExp(AnyNode):
+
+class AExp(Node):
     """
     Arithmetic expressions.
     """
 
-    def __init__(self, typename="AEXP", **kwargs):
-        """[summary]
-
-        Arguments:
-            type -- type of the AExp
-            kwargs -- optional keywords
-        """
-        super().__init__()
-        self._typename = typename
+    __slots__ = ()
 
+    _typename = "AEXP"
 
 
 class AConstant(AExp):
@@ -36,32 +31,45 @@ class AConstant(AExp):
     Constant values, namely integers.
     """
 
+    __slots__ = ("value",)
+
+    _typename = "ACONSTANT"
+    _fields = ("value",)
+
     def __init__(self, value):
-        super().__init__(typename="ACONSTANT")
         self.value = value
 
     def eval(self, state):
         return self.value
 
-    @property
-    def vars(self):
-        return set()
+    def _compile(self):
+        value = self.value
+        return lambda state: value
+
+    def _vars(self):
+        return frozenset()
 
 class AVariable(AExp):
     """
     Named variables.
     """
 
+    __slots__ = ("name",)
+
+    _typename = "AVARIABLE"
+    _fields = ("name",)
+
     def __init__(self, name):
-        super().__init__(typename="AVARIABLE")
         self.name = name
 
     def eval(self, state):
         return state[self.name]
 
-    @property
-    def vars(self):
-        return {self.name}
+    def _compile(self):
+        return operator.itemgetter(self.name)
+
+    def _vars(self):
+        return frozenset((self.name,))
 
 
 class AUnOp(AExp):
@@ -75,22 +83,26 @@ class AUnOp(AExp):
         '.': '__abs__',
     }
 
+    __slots__ = ("op", "child")
+
+    _typename = "AUNOP"
+    _fields = ("op",)
+    _children = ("child",)
+
     def __init__(self, op, aexp):
-        super().__init__(typename="AUNOP")
         self.op = op
-
-        aexp.parent = self
+        self.child = aexp
 
     def eval(self, state):
         value = self.child.eval(state)
         return getattr(value, self.OPERATORS[self.op])()
 
-    @property
-    def child(self):
-        return self.children[0]
+    def _compile(self):
+        function = getattr(operator, self.OPERATORS[self.op])
+        child = self.child.compile()
+        return lambda state: function(child(state))
 
-    @property
-    def vars(self):
+    def _vars(self):
         return self.child.vars
 
 class ABinOp(AExp):
@@ -107,29 +119,37 @@ class ABinOp(AExp):
         '**': '__pow__',
     }
 
+    __slots__ = ("op", "left", "right")
+
+    _typename = "ABINOP"
+    _fields = ("op",)
+    _children = ("left", "right")
+
     def __init__(self, op, left, right):
-        super().__init__(typename="ABINOP")
         self.op = op
-
-        left.parent = self
-        right.parent = self
+        self.left = left
+        self.right = right
 
     def eval(self, state):
         left = self.left.eval(state)
         right = self.right.eval(state)
         return getattr(left, self.OPERATORS[self.op])(right)
 
-    @property
-    def left(self):
-        return self.children[0]
-
-    @property
-    def right(self):
-        return self.children[1]
-
-    @property
-    def vars(self):
-        return set.union(self.left.vars, self.right.vars)
+    def _compile(self):
+        function = getattr(operator, self.OPERATORS[self.op])
+        left = self.left.compile()
+        # Constant and variable operands are inlined to save a call
+        if isinstance(self.right, AConstant):
+            value = self.right.value
+            return lambda state: function(left(state), value)
+        if isinstance(self.right, AVariable):
+            name = self.right.name
+            return lambda state: function(left(state), state[name])
+        right = self.right.compile()
+        return lambda state: function(left(state), right(state))
+
+    def _vars(self):
+        return self.left.vars | self.right.vars
 
 if __name__ == '__main__':
     from anytree import RenderTree
@@ -11,23 +11,20 @@ Sources
 
 """
 
-from anytree import AnyNode
+import operator
 
+from astree.aexp import AConstant
+from astree.node import Node
 
-class BExp(AnyNode):
+
+class BExp(Node):
     """
     Boolean expressions.
     """
 
-    def __init__(self, typename="BEXP", **kwargs):
-        """[summary]
+    __slots__ = ()
 
-        Arguments:
-            type -- type of the BExp
-            kwargs -- optional keywords
-        """
-        super().__init__()
-        self._typename = typename
+    _typename = "BEXP"
 
 
 class BConstant(BExp):
@@ -35,45 +32,63 @@ class BConstant(BExp):
     Constant values, namely bool.
     """
 
+    __slots__ = ("value",)
+
+    _typename = "BCONSTANT"
+    _fields = ("value",)
+
     def __init__(self, value):
-        super().__init__(typename="BCONSTANT")
         self.value = value
 
     def eval(self, state):
         return self.value
 
-    @property
-    def vars(self):
-        return {}
+    def _compile(self):
+        value = self.value
+        return lambda state: value
+
+    def _vars(self):
+        return frozenset()
 
 class BVariable(BExp):
     """
     Named variables.
     """
 
+    __slots__ = ("name",)
+
+    _typename = "BVARIABLE"
+    _fields = ("name",)
+
     def __init__(self, name):
-        super().__init__(typename="BVARIABLE")
         self.name = name
 
     def eval(self, state):
         return state[self.name]
 
-    @property
-    def vars(self):
-        return {self.name}
+    def _compile(self):
+        return operator.itemgetter(self.name)
+
+    def _vars(self):
+        return frozenset((self.name,))
 
 class BUnOp(BExp):
     """
     Unary operators.
     """
 
+    __slots__ = ("op", "child")
+
+    _typename = "BUNOP"
+    _fields = ("op",)
+    _children = ("child",)
+
     def __init__(self, op, bexp):
-        super().__init__(typename="BUNOP")
         if op in ['!']:
             self.op = op
         else:
-            raise TypeError("Unknown unary boolean operator {}".format(self.op))
-        bexp.parent = self
+            raise TypeError("Unknown unary boolean operator {}".format(op))
+        self.child = bexp
 
     def eval(self, state):
         value = self.child.eval(state)
@@ -82,12 +97,11 @@ class BUnOp(BExp):
         else:
             raise TypeError("Unknown unary boolean operator {}".format(self.op))
 
-    @property
-    def child(self):
-        return self.children[0]
+    def _compile(self):
+        child = self.child.compile()
+        return lambda state: not child(state)
 
-    @property
-    def vars(self):
+    def _vars(self):
         return self.child.vars
 
 class BBinOp(BExp):
@@ -108,22 +122,52 @@ class BBinOp(BExp):
         '>=': lambda a1, a2: a1 >= a2,
     }
 
-    def __init__(self, op, left, right):
-        super().__init__(typename="BBINOP")
+    COMPARATORS = {
+        '==': operator.eq,
+        '!=': operator.ne,
+        '<':  operator.lt,
+        '<=': operator.le,
+        '>':  operator.gt,
+        '>=': operator.ge,
+    }
 
+    __slots__ = ("op", "left", "right")
+
+    _typename = "BBINOP"
+    _fields = ("op",)
+    _children = ("left", "right")
+
+    def __init__(self, op, left, right):
         if op in ['&&', '||', '^'] + ['==', '!=', '<', '<=', '>', '>=']:
             self.op = op
         else:
-            raise TypeError("Unknown binary boolean operator {}".format(self.op))
+            raise TypeError("Unknown binary boolean operator {}".format(op))
 
-        left.parent = self
-        right.parent = self
+        self.left = left
+        self.right = right
 
     def eval(self, state):
         left = self.left.eval(state)
         right = self.right.eval(state)
         return self.OPERATORS[self.op]( left, right )
 
+    def _compile(self):
+        left = self.left.compile()
+        right = self.right.compile()
+        # Unlike eval, && and || short-circuit
+        if self.op == '&&':
+            return lambda state: left(state) and right(state)
+        elif self.op == '||':
+            return lambda state: left(state) or right(state)
+        elif self.op == '^':
+            return lambda state: left(state) ^ right(state)
+
+        function = self.COMPARATORS[self.op]
+        if isinstance(self.right, AConstant):
+            value = self.right.value
+            return lambda state: function(left(state), value)
+        return lambda state: function(left(state), right(state))
+
     @property
     def subtypes(self):
         if self.op in ['==', '!=', '<', '<=', '>', '>=']:
@@ -131,17 +175,8 @@ class BBinOp(BExp):
         elif self.op in ['&&', '||', '^']:
             return "BEXP"
 
-    @property
-    def left(self):
-        return self.children[0]
-
-    @property
-    def right(self):
-        return self.children[1]
-
-    @property
-    def vars(self):
-        return set.union(self.left.vars, self.right.vars)
+    def _vars(self):
+        return self.left.vars | self.right.vars
 
 if __name__ == '__main__':
     from aexp import *
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# Bumped whenever a public attribute of a node is reassigned, but not when it
+# is first set by a constructor. Caches are tagged with the generation they
+# were computed at, so that mutating a node also invalidates the caches of
+# its ancestors, which it has no link to.
+_generation = 0
+
+
+class Node:
+    """
+    Base class of all AST nodes.
+
+    Nodes are compact: they use __slots__ and keep their children in fixed
+    fields, listed in _children. The children property gathers them in a
+    tuple, as anytree does, so that anytree.RenderTree and print_ast can
+    still walk the tree. There is no parent link, thus a subtree can be
+    shared by several trees.
+
+    Derived data (compiled closures, variable sets) is cached on the node
+    until any node is mutated.
+    """
+
+    __slots__ = ("_cache",)
+
+    _typename = "NODE"
+
+    # Attributes shown by repr, in that order
+    _fields = ()
+
+    # Attributes holding child nodes, in that order
+    _children = ()
+
+    def __getstate__(self):
+        # Private slots hold derived data (compiled closures, caches), which
+        # is rebuilt on demand rather than copied or pickled
+        slots = dict()
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if not name.startswith("_") and hasattr(self, name):
+                    slots[name] = getattr(self, name)
+        return None, slots
+
+    def __setattr__(self, name, value):
+        global _generation
+        if not name.startswith("_") and hasattr(self, name):
+            _generation += 1
+        object.__setattr__(self, name, value)
+
+    def cached(self, key):
+        """
+        Returns the value computed by the method _<key>, memoized on the node.
+        The method must not return None.
+
+        Arguments:
+            key -- name of the cached value
+        """
+        cache = getattr(self, "_cache", None)
+        if cache is not None and cache[0] == _generation:
+            value = cache[1].get(key)
+            if value is not None:
+                return value
+        else:
+            cache = self._cache = (_generation, dict())
+
+        value = cache[1][key] = getattr(self, "_" + key)()
+        return value
+
+    def compile(self):
+        """
+        Returns a closure computing the node on a state, built by _compile.
+        """
+        return self.cached("compile")
+
+    @property
+    def vars(self):
+        """
+        Frozen set of the names of the variables read by the node.
+        """
+        return self.cached("vars")
+
+    @property
+    def typename(self):
+        return self._typename
+
+    @property
+    def children(self):
+        return tuple(getattr(self, name) for name in self._children)
+
+    def __repr__(self):
+        args = list()
+        for name in self._fields:
+            try:
+                args.append("{}={!r}".format(name, getattr(self, name)))
+            except AttributeError:
+                pass
+        return "{}({})".format(self.__class__.__name__, ", ".join(args))
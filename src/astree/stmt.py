@@ -12,24 +12,31 @@ Sources
 
 """
 
-from anytree import AnyNode
 from astree.aexp import AVariable
+from astree.node import Node
 
 
-class Stmt(AnyNode):
-    def __init__(self, typename="STMT", label=None, **kwargs):
+class Stmt(Node):
+    __slots__ = ("label",)
+
+    _typename = "STMT"
+
+    def __init__(self, label=None):
         """[summary]
 
         Arguments:
-            typename -- type of the statement
             label    -- label of the statement for the labeled WHILE language
-            kwargs   -- optional keywords
         """
-        super().__init__()
-        self._typename = typename
         if label is not None:
             self.label = label
 
+    @property
+    def def_var(self):
+        """
+        Frozen set of the names of the variables written by the statement.
+        """
+        return self.cached("def_var")
+
     def __repr__(self):
         try:
             return "{}(label={})".format(self.__class__.__name__, self.label)
@@ -38,29 +45,30 @@ class Stmt(AnyNode):
 
 
 class SSkip(Stmt):
-    def __init__(self, label=None):
-        super().__init__(typename="SSKIP", label=label)
+    __slots__ = ()
+
+    _typename = "SSKIP"
 
     def exec(self, state=dict(), verbose=True):
         return state
 
-    @property
-    def vars(self):
-        return set()
+    def _vars(self):
+        return frozenset()
 
 
 class SAssign(Stmt):
-    def __init__(self, var, aexp, label=None):
-        super().__init__(typename="SASSIGN", label=label)
+    __slots__ = ("var", "aexp")
 
-        self.var = var
-        var.parent = self
+    _typename = "SASSIGN"
+    _children = ("var", "aexp")
 
+    def __init__(self, var, aexp, label=None):
+        super().__init__(label=label)
+        self.var = var
         self.aexp = aexp
-        aexp.parent = self
 
     def exec(self, state=dict(), verbose=True):
-        value = self.aexp.eval(state)
+        value = self.aexp.compile()(state)
         state[self.var.name] = value
         return state
 
@@ -68,61 +76,78 @@ class SAssign(Stmt):
         self.exec(state, verbose)
         return state[self.var.name]
 
-    @property
-    def def_var(self):
-        return self.children[0].vars
+    def _def_var(self):
+        return self.var.vars
 
-    @property
-    def vars(self):
-        return self.children[1].vars
+    def _vars(self):
+        return self.aexp.vars
 
 
 class SSequence(Stmt):
+    __slots__ = ("stmts",)
+
+    _typename = "SSEQUENCE"
+
     def __init__(self, *args, label=None):
-        super().__init__(typename="SSEQUENCE", label=label)
-        for arg in args:
-            arg.parent = self
+        super().__init__(label=label)
+        self.stmts = args
 
     def exec(self, state=dict(), verbose=True):
-        for child in list(self.children):
+        for child in self.stmts:
             child.exec(state, verbose)
         return state
 
+    @property
+    def children(self):
+        return self.stmts
+
 
 class SIf(Stmt):
+    __slots__ = ("bexp", "strue", "sfalse")
+
+    _typename = "SIF"
+    _children = ("bexp", "strue", "sfalse")
+
     def __init__(self, bexp, strue, sfalse=SSkip(), label=None):
-        super().__init__(typename="SIF", label=label)
-        bexp.parent = self
-        strue.parent = self
-        sfalse.parent = self
+        super().__init__(label=label)
+        self.bexp = bexp
+        self.strue = strue
+        self.sfalse = sfalse
 
     def exec(self, state=dict(), verbose=True):
-        bexp, strue, sfalse = self.children
-        if bexp.eval(state):
-            return strue.exec(state, verbose)
+        if self.bexp.compile()(state):
+            return self.strue.exec(state, verbose)
         else:
-            return sfalse.exec(state, verbose)
+            return self.sfalse.exec(state, verbose)
 
 
 class SWhile(Stmt):
+    __slots__ = ("bexp", "stmt")
+
+    _typename = "SWHILE"
+    _children = ("bexp", "stmt")
+
     def __init__(self, bexp, stmt, label=None):
-        super().__init__(typename="SWHILE", label=label)
-        bexp.parent = self
-        stmt.parent = self
+        super().__init__(label=label)
+        self.bexp = bexp
+        self.stmt = stmt
 
     def exec(self, state=dict(), verbose=True):
-        bexp, stmt = self.children
-        if bexp.eval(state):
-            stmt.exec(state, verbose)
-            return self.exec(state, verbose)
-        else:
-            return state
+        condition = self.bexp.compile()
+        while condition(state):
+            self.stmt.exec(state, verbose)
+        return state
 
 
 class SInput(Stmt):
+    __slots__ = ("child",)
+
+    _typename = "SINPUT"
+    _children = ("child",)
+
     def __init__(self, aexp, label=None):
-        super().__init__(typename="SINPUT", label=label)
-        aexp.parent = self
+        super().__init__(label=label)
+        self.child = aexp
 
     def exec(self, state=dict(), verbose=True):
         if isinstance(self.child, AVariable):
@@ -133,35 +158,29 @@ class SInput(Stmt):
             raise TypeError("Input type is {type} at node {label}".format(type=self.child.typename, label=self.label))
         return state
 
-    @property
-    def child(self):
-        return self.children[0]
-
-    @property
-    def def_var(self):
+    def _def_var(self):
         return self.child.vars
 
-    @property
-    def vars(self):
-        return set()
+    def _vars(self):
+        return frozenset()
 
 
 class SPrint(Stmt):
+    __slots__ = ("child",)
+
+    _typename = "SPRINT"
+    _children = ("child",)
+
     def __init__(self, aexp, label=None):
-        super().__init__(typename="SPRINT", label=label)
-        aexp.parent = self
+        super().__init__(label=label)
+        self.child = aexp
 
     def exec(self, state=dict(), verbose=True):
         if verbose:
-            print(self.child.eval(state))
+            print(self.child.compile()(state))
         return state
 
-    @property
-    def child(self):
-        return self.children[0]
-
-    @property
-    def vars(self):
+    def _vars(self):
         return self.child.vars
 
 
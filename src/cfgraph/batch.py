@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Run many tests of a program in lockstep, with NumPy.
+
+Tests are gathered in groups standing on the same node, whose variables are
+held in int64 columns. Guards and statements are evaluated on whole columns,
+and a group is split in two on a branch whose guard does not hold for all of
+its tests. All the tests of a group thus share the same path so far.
+
+A group whose values could leave the int64 range, or which would raise an
+error (division by zero, unknown variable...), is run again test by test with
+run_test, from the initial states, so that results are those of python
+unbounded integers. So are batches of tests whose initial values are not all
+int64.
+"""
+
+# Append parentdir to import path
+import os, sys
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+from astree.aexp import *
+from astree.bexp import *
+from astree.stmt import *
+from cfgraph.dataflow import get_dead_stores, strip_dead_stores
+from cfgraph.runners import run_test
+
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+# NumPy is only loaded on the first call to run_batch
+np = None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        import numpy as np_module
+        np = np_module
+    return np
+
+
+class Fallback(Exception):
+    """
+    Raised when a group cannot be run on int64 columns.
+    """
+
+
+def run_batch(cfg, valuations):
+    """
+    Run executions for all given tests, in lockstep.
+
+    Arguments:
+        cfg        -- control flow graph of the input program
+        valuations -- a list of tests
+
+    Returns:
+        path_ids -- for each test, index of its path in paths
+        paths    -- distinct paths of the executions
+        states   -- for each test, state after execution
+    """
+
+    try:
+        load_numpy()
+    except ImportError:
+        return run_scalar(cfg, valuations, range(len(valuations)))
+
+    plans = {node: get_plan(cfg, node) for node in cfg.nodes}
+
+    path_ids = [None] * len(valuations)
+    states = [None] * len(valuations)
+    paths = list()
+    index = dict()
+
+    def finish(rows, path, cols):
+        path = tuple(path)
+        if path not in index:
+            index[path] = len(paths)
+            paths.append(list(path))
+        path_id = index[path]
+
+        names = list(cols)
+        values = zip(*(cols[name].tolist() for name in names))
+        for row, row_values in zip(rows.tolist(), values):
+            state = valuations[row].copy()
+            state.update(zip(names, row_values))
+            path_ids[row] = path_id
+            states[row] = state
+
+    # Tests are batched by initialized variables
+    batches = dict()
+    for row, valuation in enumerate(valuations):
+        batches.setdefault(tuple(valuation), list()).append(row)
+
+    # Stack of groups (node, rows, columns, path as nested tuples (node, parent))
+    groups = list()
+    scalar_rows = list()
+    for names, rows in batches.items():
+        try:
+            cols = get_columns(valuations, names, rows)
+        except Fallback:
+            scalar_rows.extend(rows)
+            continue
+        groups.append(("START", np.array(rows), cols, ("START", None)))
+
+    while groups:
+        node, rows, cols, trail = groups.pop()
+
+        if node == "END":
+            path = list()
+            while trail is not None:
+                path.append(trail[0])
+                trail = trail[1]
+            finish(rows, reversed(path), cols)
+            continue
+
+        try:
+            branches = run_node(plans[node], rows, cols)
+        except Fallback:
+            scalar_rows.extend(rows.tolist())
+            continue
+
+        for succ, succ_rows, succ_cols in branches:
+            groups.append((succ, succ_rows, succ_cols, (succ, trail)))
+
+    if scalar_rows:
+        scalar_ids, scalar_paths, scalar_states = run_scalar(cfg, valuations, scalar_rows)
+        for row, path_id in zip(scalar_rows, scalar_ids):
+            path = tuple(scalar_paths[path_id])
+            if path not in index:
+                index[path] = len(paths)
+                paths.append(list(path))
+            path_ids[row] = index[path]
+        for row, state in zip(scalar_rows, scalar_states):
+            states[row] = state
+
+    return path_ids, paths, states
+
+
+def get_columns(valuations, names, rows):
+    """
+    Gather the initial values of a batch of tests into int64 columns.
+    """
+
+    cols = dict()
+    for name in names:
+        column = [valuations[row][name] for row in rows]
+        # Booleans would become integers
+        if not set(map(type, column)) <= {int}:
+            raise Fallback()
+        try:
+            cols[name] = np.array(column, dtype=np.int64)
+        except OverflowError:
+            raise Fallback()
+    return cols
+
+
+def run_scalar(cfg, valuations, rows):
+    """
+    Run the given tests one by one, with the same results as run_batch.
+    """
+
+    path_ids = list()
+    paths = list()
+    states = list()
+    index = dict()
+
+    for row in rows:
+        path, state = run_test(cfg, valuations[row])
+        path = tuple(path)
+        if path not in index:
+            index[path] = len(paths)
+            paths.append(list(path))
+        path_ids.append(index[path])
+        states.append(state)
+
+    return path_ids, paths, states
+
+
+def get_plan(cfg, node):
+    """
+    List the (guard, statement, successor) leaving a node, in order. The
+    guard is None for an edge taken by all the tests reaching it: an
+    unconditional edge, or the else branch of an if or a while. Dead stores
+    are left out of statements, as in cfgraph.compiler.
+    """
+
+    plan = list()
+    dead = get_dead_stores(cfg.graph.get("cfg", cfg))
+    edges = [(succ, cfg.edges[node, succ]) for succ in cfg.successors(node)]
+    for j, (succ, edge) in enumerate(edges):
+        bexp = edge["bexp"]
+        if isinstance(bexp, BConstant) and bexp.value:
+            bexp = None
+        elif j == 1 and isinstance(bexp, BUnOp) and bexp.child is edges[0][1]["bexp"]:
+            bexp = None
+        plan.append((bexp, strip_dead_stores(edge["stmt"], dead), succ))
+        if bexp is None:
+            break
+
+    return plan
+
+
+def run_node(plan, rows, cols):
+    """
+    Run a group of tests through a node.
+
+    Returns:
+        branches -- list of (successor, rows, columns)
+    """
+
+    branches = list()
+
+    for bexp, stmt, succ in plan:
+        if bexp is None:
+            mask = None
+        else:
+            mask = eval_bexp(bexp, cols, len(rows))
+            if mask.all():
+                mask = None
+            elif not mask.any():
+                continue
+
+        if mask is None:
+            taken_rows, taken_cols = rows, cols
+        else:
+            taken_rows = rows[mask]
+            taken_cols = {name: column[mask] for name, column in cols.items()}
+            rows = rows[~mask]
+            cols = {name: column[~mask] for name, column in cols.items()}
+
+        run_stmt(stmt, taken_cols, len(taken_rows))
+        branches.append((succ, taken_rows, taken_cols))
+
+        if mask is None:
+            return branches
+
+    # No guard holds for some tests, which never terminate
+    raise Fallback()
+
+
+def run_stmt(stmt, cols, size):
+    if isinstance(stmt, SAssign):
+        value = eval_aexp(stmt.aexp, cols)
+        if isinstance(value, int):
+            value = np.full(size, value, dtype=np.int64)
+        cols[stmt.var.name] = value
+
+    elif isinstance(stmt, SSequence):
+        for child in stmt.stmts:
+            run_stmt(child, cols, size)
+
+    elif isinstance(stmt, (SSkip, SInput, SPrint)):
+        # Tests run without input nor output
+        pass
+
+    else:
+        raise Fallback()
+
+
+def bounds(value):
+    if isinstance(value, int):
+        return value, value
+    return int(value.min()), int(value.max())
+
+
+def check(lo, hi):
+    if lo < INT64_MIN or hi > INT64_MAX:
+        raise Fallback()
+
+
+def eval_aexp(aexp, cols):
+    """
+    Evaluate an arithmetic expression on columns. Constant expressions give
+    python integers, the others int64 arrays.
+    """
+
+    if isinstance(aexp, AConstant):
+        if type(aexp.value) is not int:
+            raise Fallback()
+        check(aexp.value, aexp.value)
+        return aexp.value
+
+    elif isinstance(aexp, AVariable):
+        if aexp.name not in cols:
+            raise Fallback()
+        return cols[aexp.name]
+
+    elif isinstance(aexp, AUnOp):
+        child = eval_aexp(aexp.child, cols)
+        lo, hi = bounds(child)
+        if aexp.op == '+':
+            return child
+        check(-hi, -lo)
+        if aexp.op == '-':
+            return -child
+        return abs(child)
+
+    elif isinstance(aexp, ABinOp):
+        left = eval_aexp(aexp.left, cols)
+        right = eval_aexp(aexp.right, cols)
+        llo, lhi = bounds(left)
+        rlo, rhi = bounds(right)
+
+        if aexp.op == '+':
+            check(llo + rlo, lhi + rhi)
+            return left + right
+        elif aexp.op == '-':
+            check(llo - rhi, lhi - rlo)
+            return left - right
+        elif aexp.op == '*':
+            products = [llo * rlo, llo * rhi, lhi * rlo, lhi * rhi]
+            check(min(products), max(products))
+            return left * right
+        elif aexp.op in ['/', '%']:
+            if rlo <= 0 <= rhi and (isinstance(right, int) or not right.all()):
+                # Division by zero
+                raise Fallback()
+            if aexp.op == '/':
+                if llo == INT64_MIN:
+                    check(llo, -llo)
+                return left // right
+            return left % right
+        elif aexp.op == '**':
+            if rlo < 0:
+                # Negative exponents give floats
+                raise Fallback()
+            base = max(abs(llo), abs(lhi))
+            if base > 1 and rhi > 63:
+                raise Fallback()
+            check(-base ** rhi, base ** rhi)
+            return left ** right
+
+    raise Fallback()
+
+
+def eval_bexp(bexp, cols, size):
+    """
+    Evaluate a guard on columns.
+
+    Returns:
+        mask -- boolean array of size size
+    """
+
+    if isinstance(bexp, BConstant):
+        return np.full(size, bool(bexp.value))
+
+    elif isinstance(bexp, BUnOp):
+        return ~eval_bexp(bexp.child, cols, size)
+
+    elif isinstance(bexp, BBinOp):
+        if bexp.subtypes == "AEXP":
+            left = eval_aexp(bexp.left, cols)
+            right = eval_aexp(bexp.right, cols)
+            result = BBinOp.COMPARATORS[bexp.op](left, right)
+            if isinstance(result, bool):
+                return np.full(size, result)
+            return result
+
+        left = eval_bexp(bexp.left, cols, size)
+        right = eval_bexp(bexp.right, cols, size)
+        if bexp.op == '&&':
+            return left & right
+        elif bexp.op == '||':
+            return left | right
+        elif bexp.op == '^':
+            return left ^ right
+
+    # Boolean variables may hold any value, leave them to run_test
+    raise Fallback()
+
+
+if __name__ == "__main__":
+    import random
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    with open(sys.argv[1]) as f:
+        source_code = f.read()
+
+    cfg = ast2cfg(parser.parse(source_code))
+    valuations = [{"x": random.randint(-100, 100)} for _ in range(10000)]
+    path_ids, paths, states = run_batch(cfg, valuations)
+
+    for path_id, path in enumerate(paths):
+        print(f"{path_ids.count(path_id):>6} tests: {path}")
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compile a control flow graph into a flat dispatch table.
+
+Nodes and edges are numbered, in the order of cfg.nodes and cfg.edges, and
+variables are numbered into slots of a list. Each node is compiled into a
+single python function, taking the slots and returning the number of the
+edge taken: its guards and statements are inlined as python code, and the
+negated guard of an if or a while is never evaluated. Running a test is then
+a loop of table lookups and calls.
+
+Expressions are parenthesized following python precedence, so that long
+chains of operators do not hit the nesting limits of the python parser.
+CFGs python still cannot compile are run by callers with the interpreter
+(see cfgraph.runners.get_compiled).
+
+Assignments overwritten before being read, and which cannot fail, are left
+out (see cfgraph.dataflow.get_dead_stores).
+
+Variables missing from the initial state hold UNSET, which raises on any
+use. The compiled code thus fails wherever the reference interpreter would,
+though not necessarily with the same exception: callers are expected to
+rerun failing tests with cfgraph.runners.interpret_test.
+"""
+
+# Append parentdir to import path
+import os, sys
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+from astree.aexp import *
+from astree.bexp import *
+from astree.stmt import *
+from cfgraph.dataflow import get_dead_stores, strip_dead_stores
+
+
+class Unset:
+    """
+    Value of the slots of variables without a value. Any operation on it
+    raises a TypeError.
+    """
+
+    __slots__ = ()
+
+    def _raise(self, *args):
+        raise TypeError("variable used before assignment")
+
+    __bool__ = __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = _raise
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return "UNSET"
+
+
+UNSET = Unset()
+
+# Binding strength of the python operators emitted, from the loosest
+SUM, PRODUCT, UNARY, POWER, ATOM = range(1, 6)
+OR, AND, NOT, COMPARISON = range(1, 5)
+
+PRECEDENCES = {'+': SUM, '-': SUM, '*': PRODUCT, '/': PRODUCT, '%': PRODUCT, '**': POWER}
+
+
+class CompiledCFG:
+    """
+    Dispatch table of a control flow graph, see compile_cfg.
+    """
+
+    __slots__ = ("labels", "names", "start", "end", "targets", "table", "source", "__weakref__")
+
+    def __init__(self, labels, names, start, end, targets, table, source):
+        self.labels = labels        # Node number -> label
+        self.names = names          # Slot number -> variable name
+        self.start = start
+        self.end = end
+        # Edge number -> node number. Edges past those of the CFG are taken
+        # when no guard holds, and lead back to their node
+        self.targets = targets
+        self.table = table          # Node number -> step function
+        self.source = source        # Python source of the step functions
+
+    def __getstate__(self):
+        # Functions cannot be pickled, they are built again from the source
+        return self.labels, self.names, self.start, self.end, self.targets, self.source
+
+    def __setstate__(self, state):
+        self.labels, self.names, self.start, self.end, self.targets, self.source = state
+        self.table = load_table(self.source, len(self.labels))
+
+    def run(self, init_state):
+        """
+        Run an execution given initial values for variables.
+
+        Arguments:
+            init_state -- a test, left untouched
+
+        Returns:
+            path  -- path of the execution
+            state -- state after execution
+        """
+
+        slots = [init_state.get(name, UNSET) for name in self.names]
+
+        table = self.table
+        targets = self.targets
+        end = self.end
+        node = self.start
+        path = [node]
+        append = path.append
+
+        while node != end:
+            node = targets[table[node](slots)]
+            append(node)
+
+        state = init_state.copy()
+        for name, value in zip(self.names, slots):
+            if value is not UNSET:
+                state[name] = value
+
+        labels = self.labels
+        return [labels[node] for node in path], state
+
+    def count(self, init_state, edge_hits, max_steps=None):
+        """
+        Run an execution given initial values for variables, counting the
+        edges it takes instead of recording its path.
+
+        Arguments:
+            init_state -- a test, left untouched
+            edge_hits  -- hit count of each edge number, updated in place
+            max_steps  -- number of edges after which the execution is
+                          stopped, unbounded by default
+
+        Returns:
+            terminated -- whether the execution reached the end node
+        """
+
+        slots = [init_state.get(name, UNSET) for name in self.names]
+
+        table = self.table
+        targets = self.targets
+        stuck = len(edge_hits)
+        end = self.end
+        node = self.start
+        steps = -1 if max_steps is None else max_steps
+
+        while node != end:
+            if not steps:
+                return False
+            steps -= 1
+
+            edge = table[node](slots)
+            if edge >= stuck:
+                # No guard holds, the execution would stay on the node
+                return False
+
+            edge_hits[edge] += 1
+            node = targets[edge]
+
+        return True
+
+
+def compile_cfg(cfg):
+    """
+    Compile a control flow graph into a dispatch table.
+
+    Arguments:
+        cfg -- control flow graph, networkx or FrozenCFG
+
+    Returns:
+        compiled -- CompiledCFG
+    """
+
+    labels = tuple(cfg.nodes)
+    index = {label: i for i, label in enumerate(labels)}
+    slots = dict()
+    dead = get_dead_stores(cfg.graph.get("cfg", cfg))
+
+    def slot(name):
+        if name not in slots:
+            slots[name] = len(slots)
+        return slots[name]
+
+    def operand(source, level):
+        # Parenthesized when binding looser than its operator requires
+        code, precedence = source
+        return code if precedence >= level else f"({code})"
+
+    def aexp_source(aexp):
+        # Returns the python source of aexp and its precedence
+        if isinstance(aexp, AConstant):
+            # Parenthesized, as -2 ** 2 would parse as -(2 ** 2)
+            return repr(aexp.value) if aexp.value >= 0 else f"({aexp.value!r})", ATOM
+        elif isinstance(aexp, AVariable):
+            return f"s[{slot(aexp.name)}]", ATOM
+        elif isinstance(aexp, AUnOp):
+            child = aexp_source(aexp.child)
+            if aexp.op == '.':
+                return f"abs({child[0]})", ATOM
+            return f"{aexp.op}{operand(child, UNARY)}", UNARY
+        elif isinstance(aexp, ABinOp):
+            op = '//' if aexp.op == '/' else aexp.op
+            level = PRECEDENCES[aexp.op]
+            if level == POWER:
+                # Right associative, and binding tighter than a unary minus
+                # on its left only
+                left, right = ATOM, UNARY
+            else:
+                left, right = level, level + 1
+            return (f"{operand(aexp_source(aexp.left), left)} {op} "
+                    f"{operand(aexp_source(aexp.right), right)}"), level
+        raise TypeError(f"Unhandled arithmetic expression {aexp}")
+
+    def bexp_source(bexp):
+        # Returns the python source of bexp and its precedence
+        if isinstance(bexp, BConstant):
+            return repr(bool(bexp.value)), ATOM
+        elif isinstance(bexp, BVariable):
+            return f"s[{slot(bexp.name)}]", ATOM
+        elif isinstance(bexp, BUnOp):
+            return f"not {operand(bexp_source(bexp.child), NOT)}", NOT
+        elif isinstance(bexp, BBinOp):
+            if bexp.subtypes == "AEXP":
+                # Arithmetic binds tighter than comparisons
+                return f"{aexp_source(bexp.left)[0]} {bexp.op} {aexp_source(bexp.right)[0]}", COMPARISON
+            if bexp.op == '^':
+                # Binds tighter than comparisons and not
+                return f"{operand(bexp_source(bexp.left), ATOM)} ^ {operand(bexp_source(bexp.right), ATOM)}", \
+                    COMPARISON
+            level = AND if bexp.op == '&&' else OR
+            op = 'and' if bexp.op == '&&' else 'or'
+            return (f"{operand(bexp_source(bexp.left), level)} {op} "
+                    f"{operand(bexp_source(bexp.right), level + 1)}"), level
+        raise TypeError(f"Unhandled boolean expression {bexp}")
+
+    def stmt_source(stmt):
+        if isinstance(stmt, SAssign):
+            target = f"s[{slot(stmt.var.name)}]"
+            if isinstance(stmt.aexp, AVariable):
+                # A copy would not raise on an unset variable
+                value, _ = aexp_source(stmt.aexp)
+                return [f"if {value} is UNSET: raise TypeError({stmt.aexp.name!r})",
+                        f"{target} = {value}"]
+            return [f"{target} = {aexp_source(stmt.aexp)[0]}"]
+        elif isinstance(stmt, SSequence):
+            return [line for child in stmt.stmts for line in stmt_source(child)]
+        elif isinstance(stmt, (SSkip, SInput, SPrint)):
+            # Tests run without input nor output
+            return []
+        raise TypeError(f"Unhandled statement {stmt}")
+
+    lines = list()
+    targets = list()
+    for i, label in enumerate(labels):
+        lines.append(f"def step_{i}(s):")
+
+        edges = [(succ, cfg.edges[label, succ]) for succ in cfg.successors(label)]
+        for j, (succ, edge) in enumerate(edges):
+            bexp = edge["bexp"]
+            body = stmt_source(strip_dead_stores(edge["stmt"], dead)) + [f"return {len(targets) + j}"]
+
+            if isinstance(bexp, BConstant) and bexp.value:
+                unconditional = True
+            elif j == 1 and isinstance(bexp, BUnOp) and bexp.child is edges[0][1]["bexp"]:
+                # Else branch of an if or a while
+                unconditional = True
+            else:
+                unconditional = False
+
+            if unconditional:
+                lines.extend(f"    {line}" for line in body)
+                break
+
+            lines.append(f"    if {bexp_source(bexp)[0]}:")
+            lines.extend(f"        {line}" for line in body)
+        else:
+            # No guard holds: stay on the node, as the interpreter does
+            lines.append(f"    return {len(cfg.edges) + i}")
+
+        targets.extend(index[succ] for succ, _ in edges)
+
+    targets.extend(range(len(labels)))
+
+    source = "\n".join(lines) + "\n"
+    table = load_table(source, len(labels))
+    names = tuple(sorted(slots, key=slots.get))
+
+    return CompiledCFG(labels, names, index["START"], index["END"], tuple(targets), table, source)
+
+
+def load_table(source, size):
+    """
+    Build the dispatch table from the source of the step functions.
+    """
+
+    namespace = {"UNSET": UNSET}
+    exec(compile(source, "<cfg>", "exec"), namespace)
+    return tuple(namespace[f"step_{i}"] for i in range(size))
+
+
+if __name__ == "__main__":
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    with open(sys.argv[1]) as f:
+        source_code = f.read()
+
+    print(compile_cfg(ast2cfg(parser.parse(source_code))).source)
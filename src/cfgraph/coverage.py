@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Coverage counters of a control flow graph.
+
+A Coverage holds a hit count for each edge of a CFG, numbered in the order
+of cfg.nodes and cfg.edges as in cfgraph.compiler, in a fixed-size list.
+Tests run in counting mode (see cfgraph.runners.count_test_set) add to the
+counts as they go, without building their paths, so that any number of
+tests can be replayed in the memory of a single CFG. Node counts are derived
+from the counts of the edges entering them.
+
+Coverage is reported on statement labels: counts on a basic-block CFG (see
+utils.ast2cfg.compact_cfg) are mapped back to the statements of the blocks.
+"""
+
+
+class Coverage:
+    """
+    Hit counts of the nodes and edges of a CFG, over a set of tests.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.labels = tuple(cfg.nodes)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.edges = [(self.index[src], self.index[dst]) for src, dst in cfg.edges]
+
+        # Node number -> {successor number: edge id}
+        self.edge_ids = [dict() for _ in self.labels]
+        for edge, (src, dst) in enumerate(self.edges):
+            self.edge_ids[src][dst] = edge
+
+        self.edge_hits = [0] * len(self.edges)
+
+        self.tests = 0                  # Number of tests counted
+        self.non_terminating = list()   # Positions of the tests stopped
+
+    def __repr__(self):
+        return "Coverage({} tests, {}/{} nodes, {}/{} edges)".format(
+            self.tests, sum(map(bool, self.node_hits)), len(self.labels),
+            sum(map(bool, self.edge_hits)), len(self.edges))
+
+    @property
+    def node_hits(self):
+        """
+        Hit count of each node number.
+        """
+
+        result = [0] * len(self.labels)
+        result[self.index["START"]] = self.tests
+        for (_, dst), hits in zip(self.edges, self.edge_hits):
+            result[dst] += hits
+        return result
+
+    def add_path(self, path):
+        """
+        Count a test, given the path of its execution as a list of labels.
+        """
+
+        nodes = [self.index[node] for node in path]
+        for src, dst in zip(nodes, nodes[1:]):
+            self.edge_hits[self.edge_ids[src][dst]] += 1
+        self.tests += 1
+
+    def merge(self, other):
+        """
+        Add the counts of another Coverage of the same CFG to this one.
+        """
+
+        if other.labels != self.labels or other.edges != self.edges:
+            raise ValueError("Coverages of different CFGs cannot be merged")
+
+        for edge, hits in enumerate(other.edge_hits):
+            self.edge_hits[edge] += hits
+
+        self.non_terminating.extend(self.tests + test for test in other.non_terminating)
+        self.tests += other.tests
+
+    def node_hits_of(self, node):
+        return self.node_hits[self.index[node]]
+
+    def edge_hits_of(self, src, dst):
+        return self.edge_hits[self.edge_ids[self.index[src]][self.index[dst]]]
+
+    def get_covered_nodes(self):
+        """
+        Returns the set of the statement labels run by at least one test.
+        """
+
+        result = set()
+        blocks = "cfg" in self.cfg.graph
+
+        for node, hits in enumerate(self.node_hits):
+            if not hits:
+                continue
+            if blocks:
+                result.update(self.cfg.nodes[self.labels[node]]["labels"])
+            else:
+                result.add(self.labels[node])
+
+        return result
+
+    def get_covered_edges(self):
+        """
+        Returns the set of the edges, between statement labels, taken by at
+        least one test.
+        """
+
+        result = set()
+
+        if "cfg" not in self.cfg.graph:
+            for edge, hits in enumerate(self.edge_hits):
+                if hits:
+                    src, dst = self.edges[edge]
+                    result.add((self.labels[src], self.labels[dst]))
+            return result
+
+        # Edges inside the blocks run, then edges between blocks
+        for node, hits in enumerate(self.node_hits):
+            if hits:
+                labels = self.cfg.nodes[self.labels[node]]["labels"]
+                result.update(zip(labels, labels[1:]))
+
+        for edge, hits in enumerate(self.edge_hits):
+            if hits:
+                src, dst = self.edges[edge]
+                src_labels = self.cfg.nodes[self.labels[src]]["labels"]
+                dst_labels = self.cfg.nodes[self.labels[dst]]["labels"]
+                result.add((src_labels[-1], dst_labels[0]))
+
+        return result
+
+    def get_uncovered_nodes(self, nodes):
+        """
+        Returns the given statement labels that no test runs.
+        """
+
+        return set(nodes) - self.get_covered_nodes()
+
+    def get_uncovered_edges(self, edges):
+        """
+        Returns the given edges, between statement labels, that no test
+        takes.
+        """
+
+        return set(edges) - self.get_covered_edges()
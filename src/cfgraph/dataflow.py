@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dataflow analyses over control flow graphs.
+
+Facts are numbered, and sets of facts are python integers used as bitsets:
+bit i is set when fact i holds. An analysis gives, for each node, the facts
+it generates and the facts it kills, and is solved by solve_dataflow with a
+worklist, in time polynomial in the size of the CFG, whatever the number of
+its paths.
+
+A node runs the guard and the statement of the edge leaving it, so the
+analyses see a node as a single statement. They are meant for CFGs built by
+ast2cfg: basic-block CFGs are analysed through the CFG they were compacted
+from (see utils.ast2cfg.compact_cfg).
+"""
+
+from collections import deque
+
+from astree.stmt import SAssign, SSequence, SSkip
+from cfgraph.utils import analysis, get_def, get_ref
+from utils.simplify import is_total
+
+
+def get_predecessors(cfg):
+    """
+    Build a dict {node: list of predecessors}, for networkx and frozen CFGs
+    alike.
+    """
+
+    result = {node: list() for node in cfg.nodes}
+    for src, dst in cfg.edges:
+        result[dst].append(src)
+    return result
+
+
+def solve_dataflow(cfg, gen, kill, backward=False, must=False, universe=0, boundary=0):
+    """
+    Solve a dataflow analysis. Facts flow along edges, forward or backward.
+    The facts on entry of a node are the union (may analysis) or the
+    intersection (must analysis) of the facts on exit of its neighbours, and
+    the facts on exit of a node are those it generates, and those on entry
+    it does not kill.
+
+    Arguments:
+        cfg      -- control flow graph of the input program
+        gen      -- a dictionnary {node: facts generated by the node}
+        kill     -- a dictionnary {node: facts killed by the node}
+        backward -- whether facts flow from successors to predecessors
+        must     -- whether facts must hold on all paths, rather than some
+        universe -- set of all facts, from which must analyses start
+        boundary -- facts on entry of START, or of END if backward
+
+    Returns:
+        before -- a dictionnary {node: facts holding before the node runs}
+        after  -- a dictionnary {node: facts holding after the node runs}
+    """
+
+    if backward:
+        sources = {node: list(cfg.successors(node)) for node in cfg.nodes}
+        targets = get_predecessors(cfg)
+    else:
+        sources = get_predecessors(cfg)
+        targets = {node: list(cfg.successors(node)) for node in cfg.nodes}
+
+    initial = universe if must else 0
+    entry = {node: initial for node in cfg.nodes}
+    exit = {node: gen[node] | (initial & ~kill[node]) for node in cfg.nodes}
+
+    worklist = deque(cfg.nodes)
+    pending = set(worklist)
+
+    while worklist:
+        node = worklist.popleft()
+        pending.discard(node)
+
+        if not sources[node]:
+            facts = boundary
+        elif must:
+            facts = universe
+            for source in sources[node]:
+                facts &= exit[source]
+        else:
+            facts = 0
+            for source in sources[node]:
+                facts |= exit[source]
+        entry[node] = facts
+
+        facts = gen[node] | (facts & ~kill[node])
+        if facts != exit[node]:
+            exit[node] = facts
+            for target in targets[node]:
+                if target not in pending:
+                    pending.add(target)
+                    worklist.append(target)
+
+    if backward:
+        return exit, entry
+    return entry, exit
+
+
+def number_definitions(cfg):
+    """
+    Number the definitions of a CFG.
+
+    Returns:
+        definitions -- list of the definitions (node, var), bit i of a set
+                       standing for definitions[i]
+        defined     -- a dictionnary {node: set of its definitions}
+        var_defs    -- a dictionnary {var: set of its definitions}
+    """
+
+    definitions = list()
+    defined = dict()
+    var_defs = dict()
+
+    for node in cfg.nodes:
+        defined[node] = 0
+        for var in sorted(get_def(cfg, node)):
+            bit = 1 << len(definitions)
+            definitions.append((node, var))
+            defined[node] |= bit
+            var_defs[var] = var_defs.get(var, 0) | bit
+
+    return definitions, defined, var_defs
+
+
+@analysis
+def get_reaching_definitions(cfg):
+    """
+    Compute the definitions reaching each node: a definition of a variable at
+    a node reaches another node if some path leads from the first to the
+    second without going through another definition of the variable.
+
+    Arguments:
+        cfg -- control flow graph of the input program
+
+    Returns:
+        definitions -- list of the definitions (node, var), bit i of a set
+                       standing for definitions[i]
+        reaching    -- a dictionnary {node: set of the definitions reaching
+                       the node, before it runs}
+    """
+
+    definitions, defined, var_defs = number_definitions(cfg)
+
+    killed = {node: 0 for node in cfg.nodes}
+    for node, var in definitions:
+        killed[node] |= var_defs[var]
+
+    reaching, _ = solve_dataflow(cfg, defined, killed)
+
+    return definitions, reaching
+
+
+@analysis
+def get_def_use_chains(cfg):
+    """
+    Build the def-use chains of a CFG: for each definition, the nodes where
+    it is used first, on some path from the definition with no other
+    definition of the variable in between. Uses following another use are
+    not counted, nor are nodes defining the variable again, as in
+    Tester.next_ref_pos.
+
+    This is a reaching definitions analysis in which a use of a variable
+    kills its definitions as well.
+
+    Arguments:
+        cfg -- control flow graph of the input program
+
+    Returns:
+        result -- a dictionnary {var: {def node: set of ref nodes}}
+    """
+
+    definitions, defined, var_defs = number_definitions(cfg)
+
+    used = dict()
+    killed = dict()
+    for node in cfg.nodes:
+        defs = get_def(cfg, node)
+        used[node] = get_ref(cfg, node) - defs
+        killed[node] = 0
+        for var in defs | used[node]:
+            killed[node] |= var_defs.get(var, 0)
+
+    reaching, _ = solve_dataflow(cfg, defined, killed)
+
+    result = dict()
+    for node, var in definitions:
+        result.setdefault(var, dict())[node] = set()
+
+    for node in cfg.nodes:
+        reached = reaching[node]
+        i = 0
+        while reached:
+            if reached & 1:
+                def_node, var = definitions[i]
+                if var in used[node]:
+                    result[var][def_node].add(node)
+            reached >>= 1
+            i += 1
+
+    return result
+
+
+def number_variables(cfg):
+    """
+    Number the variables of a CFG.
+
+    Returns:
+        variables -- list of the variables, bit i of a set standing for
+                     variables[i]
+        bits      -- a dictionnary {var: its bit}
+    """
+
+    names = set()
+    for node in cfg.nodes:
+        names |= get_def(cfg, node) | get_ref(cfg, node)
+
+    variables = sorted(names)
+    bits = {var: 1 << i for i, var in enumerate(variables)}
+
+    return variables, bits
+
+
+def live_variables(cfg, live_at_end, inputs_define):
+    """
+    Solve the live variables analysis: a variable is live at a point if some
+    path from this point reads it before writing it.
+
+    Arguments:
+        cfg           -- control flow graph of the input program
+        live_at_end   -- whether all variables are live at END, as when the
+                         final state is observed
+        inputs_define -- whether input statements write their variable
+
+    Returns:
+        variables -- list of the variables, bit i of a set standing for
+                     variables[i]
+        before    -- a dictionnary {node: variables live before the node}
+        after     -- a dictionnary {node: variables live after the node}
+    """
+
+    variables, bits = number_variables(cfg)
+
+    used = dict()
+    written = dict()
+    for node in cfg.nodes:
+        used[node] = 0
+        written[node] = 0
+        for var in get_ref(cfg, node):
+            used[node] |= bits[var]
+        for _, _, edge in cfg.out_edges(node, data=True):
+            if isinstance(edge["stmt"], SAssign) or inputs_define:
+                for var in get_def(cfg, node):
+                    written[node] |= bits[var]
+
+    universe = (1 << len(variables)) - 1
+    before, after = solve_dataflow(cfg, used, written, backward=True,
+                                   boundary=universe if live_at_end else 0)
+
+    return variables, before, after
+
+
+@analysis
+def get_live_variables(cfg):
+    """
+    Compute the variables live before and after each node, no variable being
+    live at END.
+
+    Arguments:
+        cfg -- control flow graph of the input program
+
+    Returns:
+        variables -- list of the variables, bit i of a set standing for
+                     variables[i]
+        before    -- a dictionnary {node: variables live before the node}
+        after     -- a dictionnary {node: variables live after the node}
+    """
+
+    return live_variables(cfg, live_at_end=False, inputs_define=True)
+
+
+@analysis
+def get_assigned_variables(cfg):
+    """
+    Compute the variables assigned on all paths from START to each node,
+    which thus have a value whatever the initial state. Input statements
+    leave the state untouched when tests run, and do not count.
+
+    Arguments:
+        cfg -- control flow graph of the input program
+
+    Returns:
+        variables -- list of the variables, bit i of a set standing for
+                     variables[i]
+        before    -- a dictionnary {node: variables assigned before the node}
+    """
+
+    variables, bits = number_variables(cfg)
+
+    assigned = dict()
+    for node in cfg.nodes:
+        assigned[node] = 0
+        for _, _, edge in cfg.out_edges(node, data=True):
+            if isinstance(edge["stmt"], SAssign):
+                assigned[node] |= bits[edge["stmt"].var.name]
+
+    universe = (1 << len(variables)) - 1
+    before, _ = solve_dataflow(cfg, assigned, dict.fromkeys(cfg.nodes, 0),
+                               must=True, universe=universe)
+
+    return variables, before
+
+
+def get_assignments_to(cfg, variables, live):
+    """
+    Returns the set of the labels of the assignments whose variable is not in
+    live after them.
+    """
+
+    index = {var: i for i, var in enumerate(variables)}
+
+    result = set()
+    for node in cfg.nodes:
+        for _, _, edge in cfg.out_edges(node, data=True):
+            stmt = edge["stmt"]
+            if isinstance(stmt, SAssign) and not live[node] >> index[stmt.var.name] & 1:
+                result.add(node)
+    return result
+
+
+@analysis
+def get_dead_assignments(cfg):
+    """
+    Returns the set of the labels of the assignments to a variable that no
+    later guard or statement reads. Their value does not matter to the path
+    taken, and they can be left out of path constraints (see tests.solver).
+
+    Arguments:
+        cfg -- control flow graph of the input program
+
+    Returns:
+        result -- set of labels
+    """
+
+    variables, _, after = get_live_variables(cfg)
+    return get_assignments_to(cfg, variables, after)
+
+
+@analysis
+def get_dead_stores(cfg):
+    """
+    Returns the set of the labels of the assignments whose value is
+    overwritten on every path before being read, and whose evaluation cannot
+    fail. Running a test without them gives the same path, final state and
+    errors, so runners skip them (see strip_dead_stores).
+
+    Arguments:
+        cfg -- control flow graph of the input program
+
+    Returns:
+        result -- set of labels
+    """
+
+    variables, _, after = live_variables(cfg, live_at_end=True, inputs_define=False)
+    _, assigned = get_assigned_variables(cfg)
+
+    result = set()
+    for node in get_assignments_to(cfg, variables, after):
+        names = {var for i, var in enumerate(variables) if assigned[node] >> i & 1}
+        stmt = next(iter(cfg.out_edges(node, data=True)))[2]["stmt"]
+        if is_total(stmt.aexp, names):
+            result.add(node)
+
+    return result
+
+
+def strip_dead_stores(stmt, dead):
+    """
+    Remove the statements labeled in dead from a statement leaving a node,
+    possibly the sequence of a basic block.
+    """
+
+    if isinstance(stmt, SSequence):
+        stmts = [child for child in stmt.stmts if getattr(child, "label", None) not in dead]
+        if len(stmts) == len(stmt.stmts):
+            return stmt
+        return SSequence(*stmts) if stmts else SSkip()
+
+    if isinstance(stmt, SAssign) and getattr(stmt, "label", None) in dead:
+        return SSkip()
+
+    return stmt
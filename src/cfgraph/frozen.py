@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Array-backed, immutable control flow graphs.
+
+A FrozenCFG numbers its nodes densely, in the order of the networkx graph it
+is built from, and stores successors in compressed sparse row form: the edges
+leaving node i are the edges offsets[i] to offsets[i+1] - 1, and edge e leads
+to targets[e] with guard bexps[e] and statement stmts[e]. Successors keep
+their networkx order, so that the body of a while is still its first
+successor.
+
+The integer tables are meant for hot loops. For everything else, a FrozenCFG
+also offers the read-only part of the nx.DiGraph interface used by cfgraph,
+keyed by the original labels, so that the runners, path generators and
+analyses accept it in place of the networkx graph. Loading a FrozenCFG does
+not import networkx.
+"""
+
+from array import array
+
+
+# Node type codes
+NODE = 0
+SIF = 1
+SWHILE = 2
+
+TYPES = {"SIF": SIF, "SWHILE": SWHILE}
+TYPENAMES = {code: name for name, code in TYPES.items()}
+
+
+class FrozenCFG:
+    __slots__ = ("labels", "index", "start", "end", "offsets", "targets",
+                 "types", "bexps", "stmts", "graph", "_data", "_edges",
+                 "_successors", "__weakref__")
+
+    def __init__(self, cfg):
+        self.labels = tuple(cfg.nodes)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.start = self.index["START"]
+        self.end = self.index["END"]
+
+        self.offsets = array("l", [0])
+        self.targets = array("l")
+        self.types = bytearray(len(self.labels))
+        self.bexps = list()
+        self.stmts = list()
+        self.graph = dict(cfg.graph)
+
+        self._data = list()
+        self._edges = dict()
+        self._successors = list()
+
+        for i, label in enumerate(self.labels):
+            data = cfg.nodes[label]
+            self.types[i] = TYPES.get(data.get("type"), NODE)
+            self._data.append(dict(data))
+
+            for succ, edge in cfg.adj[label].items():
+                self._edges[label, succ] = len(self.targets)
+                self.targets.append(self.index[succ])
+                self.bexps.append(edge["bexp"])
+                self.stmts.append(edge["stmt"])
+            self.offsets.append(len(self.targets))
+
+            self._successors.append(tuple(cfg.adj[label]))
+
+    def __repr__(self):
+        return "FrozenCFG({} nodes, {} edges)".format(len(self.labels), len(self.targets))
+
+    def to_labels(self, path):
+        """
+        Map a path of node numbers to a path of labels.
+        """
+        labels = self.labels
+        return [labels[i] for i in path]
+
+    def run(self, state):
+        """
+        Run an execution on the integer tables, updating state in place.
+
+        Arguments:
+            state -- initial values of the variables
+
+        Returns:
+            path -- path of the execution, as node numbers
+        """
+
+        offsets, targets, stmts = self.offsets, self.targets, self.stmts
+        guards = [bexp.compile() for bexp in self.bexps]
+        end = self.end
+
+        node = self.start
+        path = [node]
+
+        while node != end:
+            for e in range(offsets[node], offsets[node + 1]):
+                if guards[e](state):
+                    stmts[e].exec(state, verbose=False)
+                    node = targets[e]
+                    break
+
+            path.append(node)
+
+        return path
+
+    # Read-only nx.DiGraph interface, keyed by labels
+
+    @property
+    def nodes(self):
+        return NodeView(self)
+
+    @property
+    def edges(self):
+        return EdgeView(self)
+
+    def successors(self, node):
+        return iter(self._successors[self.index[node]])
+
+    def out_edges(self, node, data=False):
+        i = self.index[node]
+        labels = self.labels
+        for e in range(self.offsets[i], self.offsets[i + 1]):
+            if data:
+                yield node, labels[self.targets[e]], {"bexp": self.bexps[e], "stmt": self.stmts[e]}
+            else:
+                yield node, labels[self.targets[e]]
+
+    def number_of_nodes(self):
+        return len(self.labels)
+
+    def number_of_edges(self):
+        return len(self.targets)
+
+    def is_directed(self):
+        return True
+
+    def is_multigraph(self):
+        return False
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def __getitem__(self, node):
+        return self._successors[self.index[node]]
+
+
+class NodeView:
+    __slots__ = ("cfg",)
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+
+    def __call__(self, data=False):
+        return self.data() if data else self
+
+    def data(self):
+        return zip(self.cfg.labels, self.cfg._data)
+
+    def __len__(self):
+        return len(self.cfg.labels)
+
+    def __iter__(self):
+        return iter(self.cfg.labels)
+
+    def __contains__(self, node):
+        return node in self.cfg.index
+
+    def __getitem__(self, node):
+        return self.cfg._data[self.cfg.index[node]]
+
+
+class EdgeView:
+    __slots__ = ("cfg",)
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+
+    def __call__(self, data=False):
+        if not data:
+            return self
+        return ((src, dst, self[src, dst]) for src, dst in self)
+
+    def __len__(self):
+        return len(self.cfg.targets)
+
+    def __iter__(self):
+        return iter(self.cfg._edges)
+
+    def __contains__(self, edge):
+        return edge in self.cfg._edges
+
+    def __getitem__(self, edge):
+        e = self.cfg._edges[edge]
+        return {"bexp": self.cfg.bexps[e], "stmt": self.cfg.stmts[e]}
+
+
+def freeze(cfg):
+    """
+    Build the array-backed version of a control flow graph.
+
+    Arguments:
+        cfg -- control flow graph, as built by ast2cfg
+
+    Returns:
+        frozen -- FrozenCFG of the same nodes and edges
+    """
+
+    if isinstance(cfg, FrozenCFG):
+        return cfg
+
+    return FrozenCFG(cfg)
+
+
+def thaw(frozen):
+    """
+    Build back the networkx version of a frozen control flow graph.
+
+    Arguments:
+        frozen -- FrozenCFG
+
+    Returns:
+        cfg -- nx.DiGraph, with the same nodes, edges and attributes
+    """
+
+    import networkx as nx
+
+    if not isinstance(frozen, FrozenCFG):
+        return frozen
+
+    cfg = nx.DiGraph(**frozen.graph)
+
+    for label, data in frozen.nodes(data=True):
+        cfg.add_node(label, **data)
+
+    for src, dst, edge in frozen.edges(data=True):
+        cfg.add_edge(src, dst, **edge)
+
+    return cfg
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compact storage of execution paths.
+
+A path is stored as the dense ids of its edges, in an array of 32-bit
+integers. Consecutive identical iterations of a loop are run-length
+encoded: when the path comes back to a while node along the same edges as
+in its previous iteration, the repetitions are replaced by the pair
+(-period, count), meaning that the last period edges are repeated count
+more times.
+
+Encoded paths are interned in a PathTable, as bytes, so that a path is
+stored once however many tests follow it, and membership is a hash lookup.
+"""
+
+from array import array
+
+
+class PathTable:
+    """
+    Set of the distinct paths through a CFG, encoded and interned.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.edges = list(cfg.edges)
+        self.edge_ids = {edge: i for i, edge in enumerate(self.edges)}
+        self.loops = {node for node, data in cfg.nodes(data=True) if data.get("type") == "SWHILE"}
+
+        self.paths = list()         # Path id -> encoded path
+        self.ids = dict()           # Encoded path -> path id
+
+    def encode(self, path):
+        """
+        Encode a path given as a list of nodes.
+
+        Returns:
+            encoded -- bytes, or None if the path does not follow edges
+        """
+
+        try:
+            edges = [self.edge_ids[src, dst] for src, dst in zip(path, path[1:])]
+        except KeyError:
+            return None
+
+        result = array("i")
+        # Position in edges of the last visit of each loop
+        visits = dict()
+        i = 0
+
+        while i < len(edges):
+            node = path[i]
+            if node in self.loops:
+                last = visits.get(node)
+                visits[node] = i
+                if last is not None:
+                    period = i - last
+                    iteration = edges[last:i]
+                    count = 0
+                    while edges[i:i + period] == iteration:
+                        i += period
+                        count += 1
+                    if count:
+                        result.extend((-period, count))
+                        # Back on the loop node, after an iteration
+                        visits[node] = i - period
+                        continue
+
+            result.append(edges[i])
+            i += 1
+
+        return result.tobytes()
+
+    def decode(self, encoded):
+        """
+        Decode an encoded path into a list of nodes.
+        """
+
+        codes = array("i")
+        codes.frombytes(encoded)
+
+        edges = list()
+        codes = iter(codes)
+        for code in codes:
+            if code < 0:
+                edges.extend(edges[code:] * next(codes))
+            else:
+                edges.append(code)
+
+        path = [self.edges[edges[0]][0]]
+        path.extend(self.edges[edge][1] for edge in edges)
+        return path
+
+    def add(self, path):
+        """
+        Intern a path given as a list of nodes.
+
+        Returns:
+            path_id -- id of the path in the table
+        """
+
+        encoded = self.encode(path)
+        if encoded is None:
+            raise ValueError(f"Path {path} does not follow the edges of the CFG")
+
+        path_id = self.ids.get(encoded)
+        if path_id is None:
+            path_id = self.ids[encoded] = len(self.paths)
+            self.paths.append(encoded)
+        return path_id
+
+    def __getitem__(self, path_id):
+        return self.decode(self.paths[path_id])
+
+    def __contains__(self, path):
+        encoded = self.encode(path)
+        return encoded is not None and encoded in self.ids
+
+    def __iter__(self):
+        for encoded in self.paths:
+            yield self.decode(encoded)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def nbytes(self):
+        """
+        Size of the encoded paths, in bytes.
+        """
+
+        return sum(len(encoded) for encoded in self.paths)
@@ -2,11 +2,113 @@
 # -*- coding: utf-8 -*-
 
 from collections import Counter
+from itertools import islice
+import multiprocessing
+import os
+import pickle
+import weakref
+
+from cfgraph.compiler import compile_cfg
+from cfgraph.coverage import Coverage
+from cfgraph.frozen import FrozenCFG
+from cfgraph.paths import PathTable
+from cfgraph.utils import analysis
+
+
+class InterpretedCFG:
+    """
+    Stand-in for the dispatch table of a CFG python cannot compile, running
+    tests with the interpreter (see interpret_test). It is not stored in
+    the on-disk cache, and does not keep its CFG alive.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = weakref.ref(cfg)
+        self.edge_ids = {edge: i for i, edge in enumerate(cfg.edges)}
+
+    def __reduce__(self):
+        # Compiling would fail again wherever it is loaded
+        raise pickle.PicklingError("InterpretedCFG is not stored")
+
+    def run(self, init_state):
+        """
+        Run an execution, see CompiledCFG.run.
+        """
+
+        return interpret_test(self.cfg(), init_state)
+
+    def count(self, init_state, edge_hits, max_steps=None):
+        """
+        Run an execution counting the edges it takes, see CompiledCFG.count.
+        """
+
+        cfg = self.cfg()
+        state = init_state.copy()
+        current_node = "START"
+        steps = -1 if max_steps is None else max_steps
+
+        while current_node != "END":
+            if not steps:
+                return False
+            steps -= 1
+
+            for succ_node in cfg.successors(current_node):
+                edge = cfg.edges[current_node, succ_node]
+                if edge["bexp"].compile()(state):
+                    edge["stmt"].exec(state, verbose=False)
+                    break
+            else:
+                # No guard holds, the execution would stay on the node
+                return False
+
+            edge_hits[self.edge_ids[current_node, succ_node]] += 1
+            current_node = succ_node
+
+        return True
+
+
+@analysis
+def get_compiled(cfg):
+    """
+    Returns the dispatch table of a CFG, compiled on first use, or an
+    InterpretedCFG if python cannot compile it, e.g. for expressions nested
+    too deeply.
+    """
+
+    try:
+        return compile_cfg(cfg)
+    except (SyntaxError, RecursionError, MemoryError):
+        return InterpretedCFG(cfg)
 
 
 def run_test(cfg, init_state):
     """
-    Run an execution given initial values for variables.
+    Run an execution given initial values for variables, on the dispatch
+    table of the CFG (see cfgraph.compiler).
+
+    Arguments:
+        cfg        -- control flow graph of the input program
+        init_state -- a test
+
+    Returns:
+        path  -- path of the execution
+        state -- state after execution
+    """
+
+    try:
+        return get_compiled(cfg).run(init_state)
+    except Exception:
+        pass
+
+    # Run the test again, to fail as the interpreter does
+    return interpret_test(cfg, init_state)
+
+
+def interpret_test(cfg, init_state):
+    """
+    Run an execution given initial values for variables, interpreting the
+    guards and statements along the edges of the CFG. This is the reference
+    semantics of run_test.
 
     Arguments:
         cfg        -- control flow graph of the input program
@@ -18,13 +120,18 @@ def run_test(cfg, init_state):
     """
 
     state = init_state.copy()
+
+    if isinstance(cfg, FrozenCFG):
+        path = cfg.run(state)
+        return cfg.to_labels(path), state
+
     current_node = "START"
     path = ["START"]
 
     while current_node != "END":
         for succ_node in cfg.successors(current_node):
             edge = cfg.edges[current_node, succ_node]
-            if edge["bexp"].eval(state):
+            if edge["bexp"].compile()(state):
                 edge["stmt"].exec(state, verbose=False)
                 current_node = succ_node
                 break
@@ -47,9 +154,166 @@ def run_test_set(cfg, valuations):
     """
 
     paths = list()
+    compiled = get_compiled(cfg)
 
     for valuation in valuations:
-        path, _ = run_test(cfg, valuation)
+        try:
+            path, _ = compiled.run(valuation)
+        except Exception:
+            path = None
+        if path is None:
+            path, _ = interpret_test(cfg, valuation)
         paths.append(path)
 
     return paths
+
+
+def record_test_set(cfg, valuations, table=None):
+    """
+    Run executions for all given tests, and intern their paths.
+
+    Arguments:
+        cfg        -- control flow graph of the input program
+        valuations -- a list of tests
+        table      -- PathTable to add paths to, a new one by default
+
+    Returns:
+        table -- PathTable of the distinct paths of executions
+        ids   -- for each test, id of its path in table
+    """
+
+    if table is None:
+        table = PathTable(cfg)
+
+    ids = [table.add(path) for path in run_test_set(cfg, valuations)]
+
+    return table, ids
+
+
+def count_test(cfg, init_state, coverage, max_steps=None):
+    """
+    Run an execution given initial values for variables, adding the nodes
+    and edges it goes through to coverage instead of recording its path.
+
+    Arguments:
+        cfg        -- control flow graph of the input program
+        init_state -- a test
+        coverage   -- Coverage of cfg, updated in place
+        max_steps  -- number of edges after which the execution is deemed
+                      non-terminating, unbounded by default
+
+    Returns:
+        terminated -- whether the execution reached the end node
+
+    The test is counted in coverage.tests. A test failing with an exception
+    raises it as run_test does, leaving in coverage the hits of the steps
+    run before the failure.
+    """
+
+    coverage.tests += 1
+
+    try:
+        return get_compiled(cfg).count(init_state, coverage.edge_hits, max_steps)
+    except Exception as error:
+        failure = error
+
+    # Fail as the interpreter does
+    interpret_test(cfg, init_state)
+    raise failure
+
+
+def count_test_set(cfg, valuations, coverage=None, max_steps=None):
+    """
+    Run executions for all given tests in counting mode, see count_test.
+    Memory use does not depend on the number of tests nor on the length of
+    their executions.
+
+    Arguments:
+        cfg        -- control flow graph of the input program
+        valuations -- an iterable of tests
+        coverage   -- Coverage to add the counts to, a new one by default
+        max_steps  -- number of edges after which an execution is deemed
+                      non-terminating, unbounded by default
+
+    Returns:
+        coverage -- Coverage of cfg, whose non_terminating attribute lists
+                    the positions of the tests stopped by max_steps
+    """
+
+    if coverage is None:
+        coverage = Coverage(cfg)
+
+    for valuation in valuations:
+        if not count_test(cfg, valuation, coverage, max_steps):
+            coverage.non_terminating.append(coverage.tests - 1)
+
+    return coverage
+
+
+# CFG of a worker process of iter_test_set, shipped once by its initializer
+worker_cfg = None
+
+
+def init_worker(cfg):
+    global worker_cfg
+    worker_cfg = cfg
+    # Compile once per worker rather than on the first chunk
+    get_compiled(cfg)
+
+
+def run_chunk(chunk):
+    start, valuations = chunk
+    return start, run_test_set(worker_cfg, valuations)
+
+
+def iter_test_set(cfg, valuations, workers=None, chunksize=None, ordered=True):
+    """
+    Run executions for all given tests in a pool of processes. The CFG is
+    sent once to each worker, then tests are sent by chunks.
+
+    Arguments:
+        cfg        -- control flow graph of the input program
+        valuations -- a list of tests
+        workers    -- number of processes, all cores by default
+        chunksize  -- number of tests per task, by default such that each
+                      worker gets about 4 tasks
+        ordered    -- whether to yield paths in the order of the tests, or as
+                      soon as their chunk is done
+
+    Yields:
+        index -- position of the test in valuations
+        path  -- path of its execution
+    """
+
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, -(-len(valuations) // (workers * 4)))
+
+    if workers == 1:
+        for index, path in enumerate(run_test_set(cfg, valuations)):
+            yield index, path
+        return
+
+    iterator = iter(valuations)
+    chunks = (
+        (start, list(islice(iterator, chunksize)))
+        for start in range(0, len(valuations), chunksize)
+    )
+
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(cfg,)) as pool:
+        results = pool.imap(run_chunk, chunks) if ordered else pool.imap_unordered(run_chunk, chunks)
+        for start, paths in results:
+            for index, path in enumerate(paths, start):
+                yield index, path
+
+
+def run_test_set_parallel(cfg, valuations, workers=None, chunksize=None):
+    """
+    Run executions for all given tests in a pool of processes, see
+    iter_test_set. The result is that of run_test_set.
+
+    Returns:
+        paths -- list of paths of executions
+    """
+
+    return [path for _, path in iter_test_set(cfg, valuations, workers, chunksize)]
@@ -5,13 +5,69 @@ from collections import defaultdict, deque
 from itertools import chain
 from queue import Queue
 import copy
-import networkx as nx
+import functools
+import weakref
 
 from astree.bexp import BConstant
 from astree.stmt import SAssign, SInput
+from utils import cache
 
 ###############################################################################
 
+# Results of the analyses of each CFG: {cfg: (cache key or None, {name: result})}
+_analyses = weakref.WeakKeyDictionary()
+
+
+def analysis(function):
+    """
+    Memoize an analysis of a whole CFG, in memory and, for CFGs registered
+    with attach_cache, in the on-disk cache. Callers must not mutate the
+    results, which are shared.
+    """
+
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(cfg):
+        key, results = _analyses.setdefault(cfg, (None, dict()))
+        if name in results:
+            return results[name]
+
+        result = None
+        if key is not None:
+            result = cache.load(key, name)
+        if result is None:
+            result = function(cfg)
+            if key is not None:
+                cache.store(key, name, result)
+
+        results[name] = result
+        return result
+
+    return wrapper
+
+
+def attach_cache(cfg, key):
+    """
+    Load and store the analyses of a CFG in the on-disk cache, under the key
+    of its program (see utils.cache.source_key).
+    """
+
+    _analyses[cfg] = (key, dict())
+
+
+def get_cache_key(cfg):
+    """
+    Returns the key under which the analyses of a CFG are stored in the
+    on-disk cache, or None if it was not registered with attach_cache.
+    """
+
+    key, _ = _analyses.get(cfg, (None, None))
+    return key
+
+###############################################################################
+
+@analysis
 def get_assignments(cfg):
     """
     Returns the set of all the labels of assignment instructions.
@@ -33,6 +89,7 @@ def get_assignments(cfg):
     return result
 
 
+@analysis
 def get_decisions(cfg):
     """
     Returns the set of edges whose instructions are in a conditional branch
@@ -48,12 +105,13 @@ def get_decisions(cfg):
     result = set()
 
     for src, dst in cfg.edges:
-        if "type" in cfg.node[src] and cfg.node[src]["type"] in ["SIF", "SHIWLE"]:
+        if "type" in cfg.nodes[src] and cfg.nodes[src]["type"] in ["SIF", "SWHILE"]:
             result.add((src, dst))
 
     return result
 
 
+@analysis
 def get_distances(cfg):
     """
     Compute for each node the distance from the start node to it.
@@ -81,6 +139,7 @@ def get_distances(cfg):
     return result
 
 
+@analysis
 def get_loop(cfg):
     result = set()
 
@@ -94,25 +153,107 @@ def get_loop(cfg):
     return result
 
 
-def get_def(cfg, node):
-    result = set()
-    leaving_edges = cfg.out_edges(node, data=True)
-    for edge in leaving_edges:
-        if isinstance(edge[2]["stmt"], SAssign) or isinstance(edge[2]["stmt"], SInput):
-            result = result.union(edge[2]["stmt"].def_var)
+class DefRefIndex:
+    """
+    Variables written (defs) and read (refs) by each node of a CFG, see
+    get_def_ref_index.
+    """
 
-    return result
+    def __init__(self, cfg):
+        self.variables = list()         # Bit number -> variable name
+        self.bits = dict()              # Variable name -> bit
+        self.def_masks = dict()         # Node -> bitmask of defs
+        self.ref_masks = dict()         # Node -> bitmask of refs
+        self.defs = dict()              # Node -> frozen set of defs
+        self.refs = dict()              # Node -> frozen set of refs
+        self.def_nodes = dict()         # Variable name -> nodes defining it
+        self.ref_nodes = dict()         # Variable name -> nodes using it
+
+        for node in cfg.nodes:
+            defs = set()
+            refs = set()
+            for _, _, edge in cfg.out_edges(node, data=True):
+                if isinstance(edge["stmt"], SAssign) or isinstance(edge["stmt"], SInput):
+                    defs.update(edge["stmt"].def_var)
+                refs.update(edge["bexp"].vars)
+                refs.update(edge["stmt"].vars)
+
+            self.defs[node] = frozenset(defs)
+            self.refs[node] = frozenset(refs)
+            self.def_masks[node] = self.mask(defs)
+            self.ref_masks[node] = self.mask(refs)
+
+            # Nodes are listed in the order of cfg.nodes
+            for var in sorted(defs):
+                self.def_nodes.setdefault(var, list()).append(node)
+            for var in sorted(refs):
+                self.ref_nodes.setdefault(var, list()).append(node)
+
+    def bit(self, var):
+        """
+        Bit of a variable, numbering it on its first use.
+        """
+
+        if var not in self.bits:
+            self.bits[var] = 1 << len(self.variables)
+            self.variables.append(var)
+        return self.bits[var]
+
+    def mask(self, names):
+        result = 0
+        for var in sorted(names):
+            result |= self.bit(var)
+        return result
+
+
+@analysis
+def get_def_ref_index(cfg):
+    """
+    Index the variables written and read by each node, once per CFG.
+
+    Arguments:
+        cfg -- control flow graph of the input program
+
+    Returns:
+        index -- DefRefIndex
+    """
+
+    return DefRefIndex(cfg)
+
+
+def get_def(cfg, node):
+    return get_def_ref_index(cfg).defs[node]
 
 
 def get_ref(cfg, node):
-    result = set()
-    leaving_edges = cfg.out_edges(node, data=True)
-    for edge in leaving_edges:
-        result = result.union(edge[2]["bexp"].vars)
-        result = result.union(edge[2]["stmt"].vars)
+    return get_def_ref_index(cfg).refs[node]
+
+
+def expand_path(cfg, path):
+    """
+    Map a path of a basic-block CFG (see utils.ast2cfg.compact_cfg) back to
+    the labels of the statements it runs. Paths of a plain CFG are returned
+    as is.
+
+    Arguments:
+        cfg  -- control flow graph the path runs through
+        path -- list of nodes
+
+    Returns:
+        result -- list of statement labels
+    """
+
+    if "cfg" not in cfg.graph:
+        return path
+
+    result = list()
+    for node in path:
+        result.extend(cfg.nodes[node]["labels"])
+
     return result
 
 
+@analysis
 def get_nested_swhile(cfg):
     """
     Build a dict {swhile node: [swhile nodes nested in body]}
@@ -143,71 +284,183 @@ def get_nested_swhile(cfg):
 
     return result
 
+
+@analysis
+def get_loop_bodies(cfg):
+    """
+    Build a dict {swhile node: set of the nodes of its body}
+    """
+    result = dict()
+
+    for node, data in cfg.nodes(data=True):
+        if data.get("type") != "SWHILE":
+            continue
+        # The body of a while statement is the first successor, and is only
+        # left through the while node
+        body = set()
+        next_nodes = [next(iter(cfg.successors(node)))]
+        while next_nodes:
+            current_node = next_nodes.pop()
+            if current_node != node and current_node not in body:
+                body.add(current_node)
+                next_nodes.extend(cfg.successors(current_node))
+        result[node] = body
+
+    return result
+
 ###############################################################################
 
+@analysis
 def get_all_def(cfg):
     result = defaultdict(set)
-    for node in cfg.nodes:
-        for var in get_def(cfg, node):
-            result[var].add(node)
+    for var, nodes in get_def_ref_index(cfg).def_nodes.items():
+        result[var].update(nodes)
     return result
 
 
+@analysis
 def get_all_ref(cfg):
     result = defaultdict(set)
-    for node in cfg.nodes:
-        for var in get_ref(cfg, node):
-            result[var].add(node)
+    for var, nodes in get_def_ref_index(cfg).ref_nodes.items():
+        result[var].update(nodes)
     return result
 
 
+@analysis
 def get_all_usages(cfg):
+    """
+    Build a dict {var: {def node: set of the nodes using the definition}},
+    from the def-use chains of the reaching definitions analysis (see
+    cfgraph.dataflow).
+    """
+
+    from cfgraph.dataflow import get_def_use_chains
+
     result = defaultdict(dict)
-    for var, def_nodes in get_all_def(cfg).items():
-        for def_node in def_nodes:
-            paths = list(nx.all_simple_paths(cfg, def_node, "END"))
-            direct_usages = set()
-            # Remove paths containing a def before a ref
-            for path in paths:
-                for node in path[1:]:
-                    if var in get_def(cfg, node):
-                        break
-                    if var in get_ref(cfg, node):
-                        direct_usages.add(node)
-                        break
-            result[var][def_node] = direct_usages.copy()
+    result.update(get_def_use_chains(cfg))
 
     return result
 
 
+@analysis
 def get_all_du_paths(cfg):
-    result = list()
+    """
+    List the DU paths of a CFG, see gen_du_paths, in the order they are
+    found and without duplicates.
+    """
 
-    all_def = get_all_def(cfg)
-    all_ref = get_all_ref(cfg)
+    result = list()
+    seen = set()
 
-    for var, def_nodes in all_def.items():
+    for var, def_nodes in get_all_def(cfg).items():
         for def_node in def_nodes:
-            for path in gen_i_loops(cfg, i=1, start=def_node, end="END"):
-                for idx, node in enumerate(path[1:]):
-                    if node in all_ref[var] and path[:idx+2] not in result:
-                            result.append(path[:idx+2])
-                    if node in all_def[var]:
-                        break
+            for path in gen_du_paths(cfg, var, def_node):
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    result.append(path)
 
     return result
 
 
-def gen_k_paths(cfg, k):
+class DUPathIndex:
+    """
+    DU paths of a CFG, hashed and indexed by their def node and by their use
+    node, see get_du_path_index.
+    """
+
+    def __init__(self, du_paths):
+        self.paths = du_paths           # Id -> DU path
+        self.ids = dict()               # DU path, as a tuple -> id
+        self.by_def = dict()            # Def node -> ids of the DU paths from it
+        self.by_use = dict()            # Use node -> ids of the DU paths to it
+
+        for du_id, path in enumerate(du_paths):
+            self.ids[tuple(path)] = du_id
+            self.by_def.setdefault(path[0], list()).append(du_id)
+            self.by_use.setdefault(path[-1], list()).append(du_id)
+
+    def from_def(self, node):
+        """
+        Returns the DU paths starting on a def node, in order.
+        """
+
+        return [self.paths[du_id] for du_id in self.by_def.get(node, ())]
+
+    def to_use(self, node):
+        """
+        Returns the DU paths ending on a use node, in order.
+        """
+
+        return [self.paths[du_id] for du_id in self.by_use.get(node, ())]
+
+    def get_covered(self, path):
+        """
+        Returns the set of the ids of the DU paths that are subpaths of path.
+        """
+
+        result = set()
+        for pos, node in enumerate(path):
+            for du_id in self.by_def.get(node, ()):
+                du_path = self.paths[du_id]
+                if path[pos:pos + len(du_path)] == du_path:
+                    result.add(du_id)
+        return result
+
+    def __contains__(self, path):
+        return tuple(path) in self.ids
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+
+@analysis
+def get_du_path_index(cfg):
+    """
+    Index the DU paths of a CFG by def node and by use node.
+
+    Arguments:
+        cfg -- control flow graph of the input program
+
+    Returns:
+        index -- DUPathIndex of get_all_du_paths(cfg)
+    """
+
+    return DUPathIndex(get_all_du_paths(cfg))
+
+
+def is_pruned(cfg, path, oracle):
+    """
+    Whether the oracle rejects a path just past a guard, in which case no
+    path starting with it is feasible.
+    """
+
+    if oracle is None or len(path) < 2:
+        return False
+
+    branch = cfg.nodes[path[-2]]
+    if not ("type" in branch and branch["type"] in ["SIF", "SWHILE"]):
+        return False
+
+    return not oracle(path)
+
+
+def gen_k_paths(cfg, k, oracle=None):
     """
     Generator for valid paths from START to END, of length less than k.
     Implement a depth-first search.
 
-    WARNING: an oracle is needed to throw away unfeasible paths.
+    WARNING: an oracle is needed to throw away unfeasible paths. Given one,
+    the prefixes ending past a guard are checked, and the paths extending
+    an infeasible prefix are never searched.
 
     Arguments:
-        cfg -- Control flow graph of the input program
-        k   -- Max length for relevant paths
+        cfg    -- Control flow graph of the input program
+        k      -- Max length for relevant paths
+        oracle -- Function of a prefix, from START, returning whether it is
+                  feasible (see tests.solver.PathSolver.is_feasible)
     """
     assert(k >= 0)
 
@@ -221,6 +474,9 @@ def gen_k_paths(cfg, k):
         node, node_k = next_nodes.pop()
         current_path = current_path[:node_k] + [node]
 
+        if is_pruned(cfg, current_path, oracle):
+            continue
+
         if current_path[-1] == "END":
             yield current_path
         elif node_k + 1 <= k:
@@ -231,18 +487,22 @@ def gen_k_paths(cfg, k):
                 next_nodes.append( (succ, node_k + 1) )
 
 
-def gen_i_loops(cfg, i, start="START", end="END"):
+def gen_i_loops(cfg, i, start="START", end="END", oracle=None):
     """
     Generator for valid paths from START to END, with at most i loop executions.
     Implement a depth-first search.
 
-    WARNING: an oracle is needed to throw away unfeasible paths.
+    WARNING: an oracle is needed to throw away unfeasible paths. Given one,
+    the prefixes ending past a guard are checked, and the paths extending
+    an infeasible prefix are never searched.
 
     Arguments:
-        cfg   -- Control flow graph of the input program
-        i     -- Max number of iterations for each loop
-        start -- Start node
-        end   -- End node
+        cfg    -- Control flow graph of the input program
+        i      -- Max number of iterations for each loop
+        start  -- Start node
+        end    -- End node
+        oracle -- Function of a prefix, from start, returning whether it is
+                  feasible (see tests.solver.PathSolver.is_feasible)
     """
     assert(i >= 0)
 
@@ -259,8 +519,13 @@ def gen_i_loops(cfg, i, start="START", end="END"):
         node, node_position, state = next_nodes.pop()
         current_path = current_path[:node_position] + [node]
 
+        # Pruned only once the loop counters are updated, which later
+        # siblings see
+        pruned = is_pruned(cfg, current_path, oracle)
+
         if current_path[-1] == end:
-            yield current_path
+            if not pruned:
+                yield current_path
 
         else:
             successors = list(cfg.successors(node))
@@ -281,6 +546,9 @@ def gen_i_loops(cfg, i, start="START", end="END"):
                     else:
                         successors = successors[1:]
 
+            if pruned:
+                continue
+
             # Update state
             new_state = state.copy()
             # Reset counters for inner loops
@@ -290,3 +558,157 @@ def gen_i_loops(cfg, i, start="START", end="END"):
             # Provision next_nodes stack
             for succ in successors:
                 next_nodes.append( (succ, node_position + 1, new_state) )
+
+
+def count_k_paths(cfg, k):
+    """
+    Number of the paths of gen_k_paths(cfg, k) without an oracle, counted
+    by length in O(k * edges) rather than enumerated.
+    """
+    assert(k >= 0)
+
+    result = 0
+    counts = {"START": 1}           # Number of prefixes ending on each node
+
+    for _ in range(k + 1):
+        result += counts.pop("END", 0)
+        next_counts = defaultdict(int)
+        for node, count in counts.items():
+            for succ in cfg.successors(node):
+                next_counts[succ] += count
+        counts = next_counts
+
+    return result
+
+
+def count_i_loops(cfg, i, start="START", end="END"):
+    """
+    Number of the paths of gen_i_loops(cfg, i, start, end) without an
+    oracle, rather than enumerated.
+
+    The paths from a node only depend on the counters of the loops around
+    it: the counter of any other loop is reset before it is reached again.
+    Counts are thus memoized on the node and these counters. The search is
+    replayed in the order of gen_i_loops, whose siblings share the counters
+    of a while node visited before them.
+    """
+    assert(i >= 0)
+
+    nested_swhile = get_nested_swhile(cfg)
+    bodies = get_loop_bodies(cfg)
+
+    counts = dict()
+    stack = list()                  # Frames [key, successors left, state of successors, count]
+
+    def visit(node, state):
+        # Count of node if known, otherwise None once its frame is pushed
+        key = (node, frozenset((swhile, n) for swhile, n in state.items()
+                               if n and (swhile == node or node in bodies[swhile])))
+
+        if node == end:
+            return 1
+
+        successors = list(cfg.successors(node))
+        node_type = cfg.nodes[node].get("type")
+
+        if node_type == "SWHILE":
+            if state[node] < i:
+                state[node] = state[node] + 1
+            else:
+                successors = successors[1:]
+
+        if key in counts:
+            return counts[key]
+
+        new_state = state.copy()
+        for swhile in nested_swhile[node]:
+            new_state[swhile] = 0
+
+        # gen_i_loops pops the successors it pushed, which are reversed at if nodes
+        order = successors if node_type == "SIF" else reversed(successors)
+        stack.append([key, iter(order), new_state, 0])
+        return None
+
+    count = visit(start, defaultdict(int))
+    while stack:
+        frame = stack[-1]
+        succ = next(frame[1], None)
+        if succ is None:
+            stack.pop()
+            counts[frame[0]] = count = frame[3]
+            if stack:
+                stack[-1][3] += count
+            continue
+
+        count = visit(succ, frame[2])
+        if count is not None:
+            frame[3] += count
+
+    return count
+
+
+def gen_du_paths(cfg, var, def_node, i=1):
+    """
+    Generator for the DU paths of a definition: the prefixes of the paths of
+    gen_i_loops(cfg, i, start=def_node) ending on a use of var, with no other
+    definition of var in between. The use may define var again.
+
+    Paths are searched depth-first, as in gen_i_loops, but the search stops
+    at definitions of var, and skips the nodes where var is dead (see
+    cfgraph.dataflow.get_live_variables).
+
+    Arguments:
+        cfg      -- Control flow graph of the input program
+        var      -- Variable defined by def_node
+        def_node -- Start node
+        i        -- Max number of iterations for each loop
+    """
+    from cfgraph.dataflow import get_live_variables
+
+    index = get_def_ref_index(cfg)
+    bit = index.bits[var]
+
+    variables, live, _ = get_live_variables(cfg)
+    live_bit = 1 << variables.index(var)
+
+    nested_swhile = get_nested_swhile(cfg)
+
+    current_path = list()
+
+    next_nodes = deque()            # Stack (node, node_position in valid path, current state when node added to stack)
+    next_nodes.append( (def_node, 0, defaultdict(int)) )
+
+    while next_nodes:
+        node, node_position, state = next_nodes.pop()
+        current_path = current_path[:node_position] + [node]
+
+        if node_position > 0:
+            if index.ref_masks[node] & bit:
+                yield current_path
+            if index.def_masks[node] & bit:
+                continue
+
+        if node == "END":
+            continue
+
+        successors = list(cfg.successors(node))
+
+        if "type" in cfg.nodes[node]:
+            if cfg.nodes[node]["type"] == "SIF":
+                successors.reverse()
+
+            elif cfg.nodes[node]["type"] == "SWHILE":
+                # The body of a while statement is the first successor
+                if state[node] < i:
+                    state[node] = state[node] + 1
+                else:
+                    successors = successors[1:]
+
+        new_state = state.copy()
+        for swhile in nested_swhile[node]:
+            new_state[swhile] = 0
+
+        for succ in successors:
+            # No use of var can be reached from succ before a definition
+            if live[succ] & live_bit:
+                next_nodes.append( (succ, node_position + 1, new_state) )
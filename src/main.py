@@ -1,14 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import networkx as nx
-import matplotlib.pyplot as plt
-
-from cfgraph.runners import run_test_set
-from cfgraph.utils import *
-from syntax.parser import parser
-from tests.testor import Tester
-from utils.ast2cfg import ast2cfg
+from cfgraph.frozen import thaw
+from utils.loader import load_program
 from utils.printer import print_ast, print_cfg, write_cfg
 
 
@@ -20,11 +14,11 @@ def main():
 
     print(source_code)
 
-    ast = parser.parse(source_code)
+    ast, cfg = load_program(source_code)
+    cfg = thaw(cfg)
     print_ast(ast)
     print()
 
-    cfg = ast2cfg(ast)
     write_cfg(cfg, filename)
     print_cfg(cfg)
 
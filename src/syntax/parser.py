@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import hashlib
+import ply
 import ply.yacc as yacc
 
 # Append parentdir to import path
@@ -12,7 +14,7 @@ from syntax.lexer import tokens
 from syntax.aexp import *
 from syntax.bexp import *
 from syntax.stmt import *
-from utils.printer import print_ast
+from utils.cache import get_cache_dir
 
 
 start = 'stmt'
@@ -24,9 +26,55 @@ def p_error(p):
     else:
         print("Syntax error at EOI")
 
+def grammar_hash():
+    """
+    Hash of the grammar, computed from the same pieces as the PLY signature:
+    start symbol, tokens and the docstrings of the p_* rules.
+    """
+    pdict = globals()
+    parts = [start, " ".join(tokens)]
+    for name in sorted(pdict):
+        if name.startswith("p_") and callable(pdict[name]) and pdict[name].__doc__:
+            parts.append(pdict[name].__doc__)
+
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+def build_parser():
+    """
+    Build the parser, loading the LALR tables from the cache when possible.
+
+    Tables are pickled in a directory versioned by PLY release, under a file
+    name keyed by the grammar hash, so they are only rebuilt when either
+    changes. The file is written to a temporary name then renamed, so that
+    concurrent processes never read a partial table.
+    """
+    # See https://stackoverflow.com/questions/28950925/ply-hide-output-file
+    tables_dir = get_cache_dir(f"ply-{ply.__version__}-{yacc.__tabversion__}")
+    if tables_dir is None:
+        return yacc.yacc(debug=False, write_tables=False)
+
+    picklefile = os.path.join(tables_dir, f"parsetab-{grammar_hash()}.pickle")
+
+    if os.path.exists(picklefile):
+        try:
+            return yacc.yacc(debug=False, write_tables=False, picklefile=picklefile)
+        except Exception:
+            # Corrupted table file, rebuild it below
+            pass
+
+    tmpfile = f"{picklefile}.{os.getpid()}.tmp"
+    parser = yacc.yacc(debug=False, write_tables=False, picklefile=tmpfile)
+    try:
+        os.replace(tmpfile, picklefile)
+    except OSError:
+        pass
+
+    return parser
+
+
 # Build the parser
-# See https://stackoverflow.com/questions/28950925/ply-hide-output-file
-parser = yacc.yacc(debug=False, write_tables=False)
+parser = build_parser()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,25 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+"""
+Generation of tests satisfying the coverage criteria of tests.testor.
+
+Each generator solves the constraints of candidate paths, searched depth
+first, with a PathSolver pruning infeasible prefixes. Given a number of
+workers, generators run in parallel mode instead: the targets of the
+criterion (nodes, edges, DU paths) are searched in a pool of processes, each
+with its own CFG and Z3 solver, and targets covered by the tests of earlier
+ones are not searched (see iter_targets).
+
+Paths Z3 cannot decide in time (see tests.solver.TIMEOUT) are reported as
+undecided, and the checks of a criterion stop once they took
+tests.solver.BUDGET seconds. Generators print the Z3 statistics of their
+criterion.
+"""
+
+from collections import deque
+from itertools import islice
+import multiprocessing
 import os, sys
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
 
@@ -8,207 +27,634 @@ from cfgraph.utils import get_assignments, \
                           get_decisions, \
                           gen_k_paths, \
                           gen_i_loops, \
+                          count_k_paths, \
+                          count_i_loops, \
                           get_all_def, \
                           get_all_ref, \
-                          get_all_du_paths
-from tests.solver import generate_test
+                          get_all_du_paths, \
+                          get_du_path_index
+from tests.solver import BUDGET, UNKNOWN, PathSolver, SolverStats, get_solver_cache
 from utils.printer import timeit
 
 
+###############################################################################
+# Search of the first feasible path covering a target
+
+def search_paths(solver, paths):
+    """
+    Returns the first of paths with a test, along with this test. Returns
+    None if they are all infeasible, or UNKNOWN if some are undecided.
+    """
+
+    result = None
+    for path in paths:
+        test = solver.solve(path)
+        if test is UNKNOWN:
+            result = UNKNOWN
+        elif not test is None:
+            return path, test
+    return result
+
+
+def search_assignment(cfg, solver, node):
+    """
+    Returns the first feasible path from START to an assignment node, with
+    its test (see search_paths).
+    """
+
+    return search_paths(solver, gen_i_loops(cfg, i=1, start="START", end=node, oracle=solver.is_feasible))
+
+
+def search_decision(cfg, solver, edge):
+    """
+    Returns the first feasible path from START taking a decision edge, with
+    its test (see search_paths).
+    """
+
+    paths = gen_i_loops(cfg, i=1, start="START", end=edge[0], oracle=solver.is_feasible)
+    return search_paths(solver, (path + [edge[1]] for path in paths))
+
+
+def search_definition(cfg, solver, def_node):
+    """
+    Returns the first feasible path from START following a DU path of a
+    definition, with its test (see search_paths).
+    """
+
+    # TODO: we should avoid non simple paths there
+    paths = (prefixpath + subpath[1:]
+             for subpath in get_du_path_index(cfg).from_def(def_node)
+             for prefixpath in gen_i_loops(cfg, i=1, start="START", end=subpath[0], oracle=solver.is_feasible))
+    return search_paths(solver, paths)
+
+
+def search_du_path(cfg, solver, subpath):
+    """
+    Returns the first feasible path from START to END following a DU path,
+    with its test (see search_paths).
+    """
+
+    def gen_paths():
+        for prefixpath in gen_i_loops(cfg, i=1, start="START", end=subpath[0], oracle=solver.is_feasible):
+            prefix = prefixpath + list(subpath[1:])
+            oracle = lambda suffixpath: solver.is_feasible(prefix + suffixpath[1:])
+            for suffixpath in gen_i_loops(cfg, i=1, start=subpath[-1], end="END", oracle=oracle):
+                yield prefix + suffixpath[1:]
+
+    return search_paths(solver, gen_paths())
+
+
+def search_use(cfg, solver, ref_node):
+    """
+    Returns the first feasible path from START to END following a DU path
+    to a use, with its test (see search_paths).
+    """
+
+    result = None
+    for subpath in get_du_path_index(cfg).to_use(ref_node):
+        found = search_du_path(cfg, solver, subpath)
+        if found is UNKNOWN:
+            result = UNKNOWN
+        elif not found is None:
+            return found
+    return result
+
+
+def get_definitions(cfg):
+    result = set()
+    for nodes in get_all_def(cfg).values():
+        result.update(nodes)
+    return result
+
+
+def get_uses(cfg):
+    result = set()
+    for nodes in get_all_ref(cfg).values():
+        result.update(nodes)
+    return result
+
+
+def get_du_path_targets(cfg):
+    return [tuple(path) for path in get_all_du_paths(cfg)]
+
+
+def covered_definitions(cfg, path):
+    du_index = get_du_path_index(cfg)
+    return {du_index.paths[du_id][0] for du_id in du_index.get_covered(path)}
+
+
+def covered_uses(cfg, path):
+    du_index = get_du_path_index(cfg)
+    return {du_index.paths[du_id][-1] for du_id in du_index.get_covered(path)}
+
+
+def covered_du_paths(cfg, path):
+    du_index = get_du_path_index(cfg)
+    return {tuple(du_index.paths[du_id]) for du_id in du_index.get_covered(path)}
+
+
+# Criterion -> (targets of a CFG, search of a target, targets covered by a path)
+CRITERIA = {
+    "ta": (get_assignments, search_assignment, lambda cfg, path: set(path)),
+    "td": (get_decisions, search_decision, lambda cfg, path: set(zip(path, path[1:]))),
+    "tdef": (get_definitions, search_definition, covered_definitions),
+    "tu": (get_uses, search_use, covered_uses),
+    "tdu": (get_du_path_targets, search_du_path, covered_du_paths),
+}
+
+
+###############################################################################
+# Parallel mode
+
+# Result of a target covered by the tests of the targets before it
+COVERED = "covered"
+
+def search_isolated(cfg, criterion, target, budget=None):
+    """
+    Search a target with a solver of its own, so that the result does not
+    depend on the targets the process searched before. Returns the result
+    of the search along with the statistics of the solver.
+    """
+
+    _, search, _ = CRITERIA[criterion]
+    solver = PathSolver(cfg, isolated=True, budget=budget)
+    return search(cfg, solver, target), solver.stats
+
+
+def solve_isolated(cfg, paths, budget=None):
+    """
+    Solve a chunk of paths with a solver of its own, see search_isolated.
+    """
+
+    solver = PathSolver(cfg, isolated=True, budget=budget)
+    return [(path, solver.solve(path)) for path in paths], solver.stats
+
+
+def get_budget_left(budget, stats):
+    return None if budget is None else max(budget - stats.time, 0.0)
+
+
+# CFG of a worker process, shipped once by its initializer
+worker_cfg = None
+
+
+def init_worker(cfg):
+    global worker_cfg
+    worker_cfg = cfg
+
+
+def search_target(criterion, target, budget):
+    return search_isolated(worker_cfg, criterion, target, budget)
+
+
+def solve_chunk(paths, budget):
+    return solve_isolated(worker_cfg, paths, budget)
+
+
+def iter_targets(cfg, criterion, workers=None, window=None, budget=None, stats=None):
+    """
+    Search the first feasible path of each target of a criterion, in a pool
+    of processes. The CFG is sent once to each worker, then targets one by
+    one.
+
+    Targets are taken in a fixed order, and those covered by the paths found
+    for the targets before them are not searched: their search is not even
+    sent to the pool when this is already known, and its result is dropped
+    otherwise. Each target is searched with a solver of its own. Results are
+    thus those of a search in order, whatever the number of workers, as
+    long as no check times out.
+
+    Arguments:
+        cfg       -- control flow graph of the input program
+        criterion -- key of CRITERIA
+        workers   -- number of processes, all cores by default. With a
+                     single one, targets are searched in this process
+        window    -- number of targets sent ahead of the first one without
+                     result, 4 per worker by default
+        budget    -- seconds of checks for all the targets, unbounded by
+                     default. Each search is given what is left when it is
+                     sent, so the budget may be overrun by those in flight
+        stats     -- SolverStats updated with the checks of each search
+
+    Yields:
+        target -- target of the criterion, in order
+        found  -- pair (path, test) of the first feasible path covering the
+                  target, None if there is none, UNKNOWN if it could not be
+                  decided, or COVERED
+    """
+
+    get_targets, search, get_covered = CRITERIA[criterion]
+    targets = sorted(get_targets(cfg), key=repr)
+    covered = set()
+    stats = SolverStats() if stats is None else stats
+
+    workers = workers or os.cpu_count() or 1
+    window = window or 4 * workers
+
+    pool = None
+    if workers == 1:
+        # Searched lazily, when their result is needed
+        submit = lambda target: lambda: search_isolated(cfg, criterion, target, get_budget_left(budget, stats))
+    else:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(cfg,))
+        submit = lambda target: pool.apply_async(
+            search_target, (criterion, target, get_budget_left(budget, stats))).get
+
+    try:
+        pending = dict()
+        submitted = 0
+
+        for index, target in enumerate(targets):
+            while submitted < min(len(targets), index + window):
+                if targets[submitted] not in covered:
+                    pending[submitted] = submit(targets[submitted])
+                submitted += 1
+
+            result = pending.pop(index, None)
+            if target in covered:
+                yield target, COVERED
+                continue
+
+            found, target_stats = result()
+            stats.update(target_stats)
+            if not found is None and not found is UNKNOWN:
+                covered.update(get_covered(cfg, found[0]))
+            yield target, found
+
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+        raise
+
+    if pool is not None:
+        # Let the searches of covered targets still queued finish
+        pool.close()
+        pool.join()
+
+
+def iter_solved_paths(cfg, paths, workers=None, chunksize=64, window=None, budget=None, stats=None):
+    """
+    Solve paths in a pool of processes. Consecutive paths are sent by
+    chunks, each solved by a PathSolver of its own sharing their prefixes,
+    so that results do not depend on the number of workers.
+
+    Arguments:
+        cfg       -- control flow graph of the input program
+        paths     -- iterable of paths, searched depth first
+        workers   -- number of processes, all cores by default
+        chunksize -- number of paths per task
+        window    -- number of chunks sent ahead of the first one without
+                     result, 4 per worker by default
+        budget    -- seconds of checks for all the paths, see iter_targets
+        stats     -- SolverStats updated with the checks of each chunk
+
+    Yields:
+        path -- a path, in order
+        test -- a test following path, None if it is infeasible, or UNKNOWN
+    """
+
+    stats = SolverStats() if stats is None else stats
+    workers = workers or os.cpu_count() or 1
+    window = window or 4 * workers
+
+    iterator = iter(paths)
+    chunks = iter(lambda: list(islice(iterator, chunksize)), [])
+
+    pool = None
+    if workers == 1:
+        submit = lambda chunk: lambda: solve_isolated(cfg, chunk, get_budget_left(budget, stats))
+    else:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(cfg,))
+        submit = lambda chunk: pool.apply_async(solve_chunk, (chunk, get_budget_left(budget, stats))).get
+
+    try:
+        pending = deque(submit(chunk) for chunk in islice(chunks, window))
+        while pending:
+            results, chunk_stats = pending.popleft()()
+            stats.update(chunk_stats)
+            pending.extend(submit(chunk) for chunk in islice(chunks, 1))
+            yield from results
+
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+        raise
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+def gen_targets(cfg, criterion, workers):
+    """
+    Parallel mode of the generators of targeted criteria, see iter_targets.
+    """
+
+    tests = list()
+    missing = list()
+    undecided = list()
+    covered = 0
+    stats = SolverStats()
+
+    for target, found in iter_targets(cfg, criterion, workers, budget=BUDGET, stats=stats):
+        if found is COVERED:
+            covered += 1
+        elif found is None:
+            missing.append(target)
+        elif found is UNKNOWN:
+            undecided.append(target)
+        else:
+            tests.append(found[1])
+
+    if missing:
+        print(f"No tests found for {missing}")
+    if undecided:
+        print(f"Undecided targets {undecided}")
+
+    total = len(tests) + len(missing) + len(undecided) + covered
+    if total:
+        print(f"Feasibility of {(len(tests) + covered) / total * 100:.2f}%")
+    print(f"{covered} targets covered by the tests of others")
+    print(stats)
+
+    tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
+    print(f"Generated test : {tests}")
+
+
+def gen_paths(cfg, paths, workers):
+    """
+    Parallel mode of the generators of path criteria, see iter_solved_paths.
+    """
+
+    tests = list()
+    counter = 0
+    stats = SolverStats()
+
+    for path, test in iter_solved_paths(cfg, paths, workers, budget=BUDGET, stats=stats):
+        counter += 1
+        if test is None:
+            print(f"Path {path} is infeasible")
+        elif test is UNKNOWN:
+            print(f"Path {path} is undecided")
+        else:
+            tests.append(test)
+
+    if counter:
+        print(f"Feasibility of {len(tests) / counter * 100:.2f}%")
+    print(stats)
+
+    tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
+    print(f"Generated test : {tests}")
+
+
+###############################################################################
+# Generators
+
 @timeit
-def gen_ta(cfg):
+def gen_ta(cfg, workers=None):
+    if workers is not None:
+        return gen_targets(cfg, "ta", workers)
+
+    solver = PathSolver(cfg, budget=BUDGET)
     assign_nodes = get_assignments(cfg)
     tests = list()
 
     for node in assign_nodes:
-        for path in gen_i_loops(cfg, i=1, start="START", end=node):
-            test = generate_test(cfg, path)
-            if not test is None:
-                tests.append(test)
-                break
-        else:
+        found = search_assignment(cfg, solver, node)
+        if found is None:
             print(f"Node {node} is unreachable")
+        elif found is UNKNOWN:
+            print(f"Node {node} is undecided")
+        else:
+            tests.append(found[1])
 
     if assign_nodes:
         print(f"Feasibility of {len(tests) / len(assign_nodes) * 100:.2f}%")
 
+    print(f"Pruned {solver.pruned} infeasible prefixes")
+    print(f"Solver cache: {solver.hits} hits out of {solver.queries} queries")
+    print(solver.stats)
+
     tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
     print(f"Generated test : {tests}")
 
 
 @timeit
-def gen_td(cfg):
+def gen_td(cfg, workers=None):
+    if workers is not None:
+        return gen_targets(cfg, "td", workers)
+
+    solver = PathSolver(cfg, budget=BUDGET)
     edges = get_decisions(cfg)
     tests = list()
 
     for edge in edges:
-        for path in gen_i_loops(cfg, i=1, start="START", end=edge[0]):
-            path.append(edge[1])
-            test = generate_test(cfg, path)
-            if not test is None:
-                tests.append(test)
-                break
-        else:
+        found = search_decision(cfg, solver, edge)
+        if found is None:
             print(f"Edge {edge} is unreachable")
+        elif found is UNKNOWN:
+            print(f"Edge {edge} is undecided")
+        else:
+            tests.append(found[1])
 
     if edges:
         print(f"Feasibility of {len(tests) / len(edges) * 100:.2f}%")
 
+    print(f"Pruned {solver.pruned} infeasible prefixes")
+    print(f"Solver cache: {solver.hits} hits out of {solver.queries} queries")
+    print(solver.stats)
+
     tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
     print(f"Generated test : {tests}")
 
 
-
 @timeit
-def gen_ktc(cfg, k):
+def gen_ktc(cfg, k, workers=None):
+    if workers is not None:
+        return gen_paths(cfg, gen_k_paths(cfg, k), workers)
+
+    solver = PathSolver(cfg, budget=BUDGET)
     tests = list()
     counter = 0
 
-    for path in gen_k_paths(cfg, k):
+    for path in gen_k_paths(cfg, k, oracle=solver.is_feasible):
         counter += 1
 
-        test = generate_test(cfg, path)
+        test = solver.solve(path)
         if test is None:
             print(f"Path {path} is infeasible")
+        elif test is UNKNOWN:
+            print(f"Path {path} is undecided")
         else:
             tests.append(test)
 
-    if counter:
-        print(f"Feasibility of {len(tests) / counter * 100:.2f}%")
+    # The paths of pruned prefixes count as infeasible, as in parallel mode
+    total = count_k_paths(cfg, k)
+    if total:
+        print(f"Feasibility of {len(tests) / total * 100:.2f}%")
+
+    print(f"Pruned {solver.pruned} infeasible prefixes, {total - counter} paths")
+    print(f"Solver cache: {solver.hits} hits out of {solver.queries} queries")
+    print(solver.stats)
 
     tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
     print(f"Generated test : {tests}")
 
 
 @timeit
-def gen_itb(cfg, i):
+def gen_itb(cfg, i, workers=None):
+    if workers is not None:
+        return gen_paths(cfg, gen_i_loops(cfg, i), workers)
+
+    solver = PathSolver(cfg, budget=BUDGET)
     tests = list()
     counter = 0
 
-    for path in gen_i_loops(cfg, i):
+    for path in gen_i_loops(cfg, i, oracle=solver.is_feasible):
         counter += 1
 
-        test = generate_test(cfg, path)
+        test = solver.solve(path)
         if test is None:
             print(f"Path {path} is infeasible")
+        elif test is UNKNOWN:
+            print(f"Path {path} is undecided")
         else:
             tests.append(test)
 
-    print(f"Feasibility of {len(tests) / counter * 100:.2f}%")
+    # The paths of pruned prefixes count as infeasible, as in parallel mode
+    total = count_i_loops(cfg, i)
+    if total:
+        print(f"Feasibility of {len(tests) / total * 100:.2f}%")
+
+    print(f"Pruned {solver.pruned} infeasible prefixes, {total - counter} paths")
+    print(f"Solver cache: {solver.hits} hits out of {solver.queries} queries")
+    print(solver.stats)
 
     tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
     print(f"Generated test : {tests}")
 
 
 @timeit
-def gen_tdef(cfg):
-    def_nodes = set()
-    du_paths = get_all_du_paths(cfg)
+def gen_tdef(cfg, workers=None):
+    if workers is not None:
+        return gen_targets(cfg, "tdef", workers)
+
+    solver = PathSolver(cfg, budget=BUDGET)
+    def_nodes = get_definitions(cfg)
     tests = list()
+    undecided = set()
 
-    for nodes in get_all_def(cfg).values():
-        def_nodes.update(nodes)
-
-    for subpath in du_paths:
-        # TODO: we should avoid non simple paths there
-        if subpath[0] in def_nodes:
-            for prefixpath in gen_i_loops(cfg, i=1, start="START", end=subpath[0]):
-                for suffixpath in gen_i_loops(cfg, i=1, start=subpath[-1], end="END"):
-                    path = prefixpath + subpath[1:] + suffixpath[1:]
-                    path = prefixpath + subpath[1:]
-                    test = generate_test(cfg, path)
-                    if not test is None:
-                        tests.append(test)
-                        def_nodes.remove(subpath[0])
-                        break
-                else:
-                    continue
-                break
+    for def_node in list(def_nodes):
+        found = search_definition(cfg, solver, def_node)
+        if found is UNKNOWN:
+            undecided.add(def_node)
+            def_nodes.remove(def_node)
+        elif not found is None:
+            tests.append(found[1])
+            def_nodes.remove(def_node)
 
     if def_nodes:
         print(f"No tests found for def {def_nodes}")
+    if undecided:
+        print(f"Undecided def {undecided}")
 
-    if len(tests) + len(def_nodes) != 0:
-        print(f"Feasibility of {len(tests) / (len(tests) + len(def_nodes)) * 100:.2f}%")
+    total = len(tests) + len(def_nodes) + len(undecided)
+    if total != 0:
+        print(f"Feasibility of {len(tests) / total * 100:.2f}%")
+
+    print(f"Pruned {solver.pruned} infeasible prefixes")
+    print(f"Solver cache: {solver.hits} hits out of {solver.queries} queries")
+    print(solver.stats)
 
     tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
     print(f"Generated test : {tests}")
 
 
 @timeit
-def gen_tu(cfg):
-    ref_nodes = set()
-    du_paths = get_all_du_paths(cfg)
+def gen_tu(cfg, workers=None):
+    if workers is not None:
+        return gen_targets(cfg, "tu", workers)
+
+    solver = PathSolver(cfg, budget=BUDGET)
+    ref_nodes = get_uses(cfg)
     tests = list()
+    undecided = set()
 
-    for nodes in get_all_ref(cfg).values():
-        ref_nodes.update(nodes)
-
-    for subpath in du_paths:
-        if subpath[-1] in ref_nodes:
-            for prefixpath in gen_i_loops(cfg, i=1, start="START", end=subpath[0]):
-                for suffixpath in gen_i_loops(cfg, i=1, start=subpath[-1], end="END"):
-                    path = prefixpath + subpath[1:] + suffixpath[1:]
-                    test = generate_test(cfg, path)
-                    if not test is None:
-                        tests.append(test)
-                        ref_nodes.remove(subpath[-1])
-                        break
-                else:
-                    continue
-                break
+    for ref_node in list(ref_nodes):
+        found = search_use(cfg, solver, ref_node)
+        if found is UNKNOWN:
+            undecided.add(ref_node)
+            ref_nodes.remove(ref_node)
+        elif not found is None:
+            tests.append(found[1])
+            ref_nodes.remove(ref_node)
 
     if ref_nodes:
         print(f"No tests found for ref {ref_nodes}")
+    if undecided:
+        print(f"Undecided ref {undecided}")
+
+    total = len(tests) + len(ref_nodes) + len(undecided)
+    if total != 0:
+        print(f"Feasibility of {len(tests) / total * 100:.2f}%")
 
-    if len(tests) + len(ref_nodes) != 0:
-        print(f"Feasibility of {len(tests) / (len(tests) + len(ref_nodes)) * 100:.2f}%")
+    print(f"Pruned {solver.pruned} infeasible prefixes")
+    print(f"Solver cache: {solver.hits} hits out of {solver.queries} queries")
+    print(solver.stats)
 
     tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
     print(f"Generated test : {tests}")
 
 
 @timeit
-def gen_tdu(cfg):
+def gen_tdu(cfg, workers=None):
+    if workers is not None:
+        return gen_targets(cfg, "tdu", workers)
+
+    solver = PathSolver(cfg, budget=BUDGET)
     paths = get_all_du_paths(cfg)
     tests = list()
 
     for subpath in paths:
-        for prefixpath in gen_i_loops(cfg, i=1, start="START", end=subpath[0]):
-            for suffixpath in gen_i_loops(cfg, i=1, start=subpath[-1], end="END"):
-                path = prefixpath + subpath[1:] + suffixpath[1:]
-                test = generate_test(cfg, path)
-                if not test is None:
-                    tests.append(test)
-                    break
-            else:
-                continue
-            break
-        else:
+        found = search_du_path(cfg, solver, subpath)
+        if found is None:
             print(f"Simple path {subpath} is infeasible")
+        elif found is UNKNOWN:
+            print(f"Simple path {subpath} is undecided")
+        else:
+            tests.append(found[1])
 
     if paths:
         print(f"Feasibility of {len(tests) / len(paths) * 100:.2f}%")
 
+    print(f"Pruned {solver.pruned} infeasible prefixes")
+    print(f"Solver cache: {solver.hits} hits out of {solver.queries} queries")
+    print(solver.stats)
+
     tests = [dict(item) for item in set(tuple(test.items()) for test in tests)]
     print(f"Generated test : {tests}")
 
 
 if __name__ == "__main__":
-    from syntax.parser import parser
-    from utils.ast2cfg import ast2cfg
+    from utils.loader import load_program
 
     filename = sys.argv[1]
     with open(filename) as f:
         source_code = f.read()
 
-    ast = parser.parse(source_code)
-    cfg = ast2cfg(ast)
+    # Parallel mode, given a number of workers (0 for all cores)
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    ast, cfg = load_program(source_code)
+
+    gen_ta(cfg, workers)
+    gen_td(cfg, workers)
+    gen_ktc(cfg, 10, workers)
+    gen_itb(cfg, 1, workers)
+    gen_tdef(cfg, workers)
+    gen_tu(cfg, workers)
+    gen_tdu(cfg, workers)
 
-    gen_ta(cfg)
-    gen_td(cfg)
-    gen_ktc(cfg, 10)
-    gen_itb(cfg, 1)
-    gen_tdef(cfg)
-    gen_tu(cfg)
-    gen_tdu(cfg)
+    # Keep the results for the next runs
+    print(get_solver_cache(cfg))
+    get_solver_cache(cfg).save()
@@ -7,33 +7,96 @@ sys.path.insert(1, os.path.join(sys.path[0], '..'))
 from astree.aexp import *
 from astree.bexp import *
 from astree.stmt import *
-from collections import defaultdict
-from z3 import *
+from cfgraph.dataflow import get_dead_assignments
+from cfgraph.utils import get_cache_key
+from collections import OrderedDict, defaultdict
+from utils import cache
+import time
+import weakref
 
 
 
 VERBOSE = False
 
+# Z3 is slow to import, it is only loaded on the first call to generate_test
+z3 = None
+
+# Upper bound on the number of results kept by a SolverCache
+CACHE_SIZE = int(os.environ.get("IMP_SOLVER_CACHE_SIZE", 100000))
+
+# Time limit of each check, in milliseconds (0 for none)
+TIMEOUT = int(os.environ.get("IMP_SOLVER_TIMEOUT", 10000))
+
+# Time limit of all the checks of a generation criterion, in seconds (0 for
+# none), see PathSolver
+BUDGET = float(os.environ.get("IMP_CRITERION_BUDGET", 0)) or None
+
+
+# Solver results of each CFG
+_caches = weakref.WeakKeyDictionary()
+
+
+class Unknown:
+    """
+    Result of a path Z3 could not decide, usually for lack of time: non-linear
+    integer arithmetic is undecidable. Pickled by reference, so that UNKNOWN
+    stays unique across processes.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "UNKNOWN"
+
+    def __repr__(self):
+        return "UNKNOWN"
+
+
+UNKNOWN = Unknown()
+
+
+def load_z3():
+    global z3
+    if z3 is None:
+        import z3 as z3_module
+        z3 = z3_module
+    return z3
+
+
+def generate_test(cfg, path, verbose=False, timeout=TIMEOUT, stats=None):
+    """
+    Returns a test following path, None if it is infeasible, or UNKNOWN if
+    Z3 could not decide within timeout milliseconds. The check is recorded
+    in stats, a SolverStats, if given.
+    """
 
-def generate_test(cfg, path, verbose=False):
     # Configure verbosity
     global VERBOSE
     VERBOSE = verbose
 
+    # Paths already solved are not sent to Z3 again
+    solver_cache = get_solver_cache(cfg)
+    hit, result = solver_cache.lookup(path)
+    if hit:
+        if verbose:
+            print(f"Result for path {path} found in cache: {result}")
+        return result
+
     # Setup solver
-    s = Solver()
+    s = load_z3().Solver()
+    if timeout:
+        s.set("timeout", timeout)
 
     # On-the-fly generation of input varnames and symbols
     inputs = set()
     symbols = defaultdict(list)
 
+    # Assignments that no guard depends on
+    dead = get_dead_assignments(cfg.graph.get("cfg", cfg))
+
     # Generate constraints
     for i in range(len(path) - 1):
-        edge = cfg.edges[path[i], path[i+1]]
-        if isinstance(edge["stmt"], SSkip):
-            s.add( get_bexp_symbol(s, symbols, edge["bexp"]) )
-        else:
-            add_stmt(s, symbols, edge["stmt"], inputs)
+        add_edge(s, symbols, cfg.edges[path[i], path[i+1]], inputs, dead)
 
     if verbose:
         print(f"Free variables in problem: {inputs}")
@@ -41,28 +104,417 @@ def generate_test(cfg, path, verbose=False):
         print(f"Problem given to Z3: {s}")
 
     # Solve and send results
-    check = s.check()
+    check, result = check_path(s, symbols, inputs, stats)
 
     if verbose:
         print(f"Status of the solver: {check}")
 
-    try:
-        result = dict()
-        for var in inputs:
-            result[var] = s.model()[symbols[var][0]]    # TODO: may be None
+    if result is not UNKNOWN:
+        solver_cache.add(path, result)
 
-        if verbose:
+    if verbose:
+        if result is None:
+            print(f"No test found for path {path}")
+        elif result is UNKNOWN:
+            print(f"Path {path} is undecided: {s.reason_unknown()}")
+        else:
             print(f"One test found for path {path}: {result}")
 
+    return result
+
+
+def check_path(s, symbols, inputs, stats=None, counted=0):
+    """
+    Check the constraints of a path asserted in a solver. See
+    SolverStats.record for counted.
+
+    Returns:
+        status -- result of the check
+        result -- a test following the path, None if it is infeasible, or
+                  UNKNOWN
+    """
+
+    ts = time.perf_counter()
+    status = s.check()
+    te = time.perf_counter()
+
+    if stats is not None:
+        stats.record(status, te - ts, s.statistics(), counted)
+
+    if status == z3.sat:
+        return status, get_test(s, symbols, inputs)
+    elif status == z3.unsat:
+        return status, None
+    return status, UNKNOWN
+
+
+def get_test(s, symbols, inputs):
+    """
+    Read a test from the model of a satisfiable solver.
+    """
+
+    model = s.model()
+    result = dict()
+    for var in inputs:
+        value = model[symbols[var][0]]    # TODO: may be None
+        result[var] = None if value is None else value.as_long()
+    return result
+
+
+class SolverStats:
+    """
+    Statistics of the checks of a solver, or of the solvers of a generation
+    criterion once merged by update.
+    """
+
+    def __init__(self):
+        self.checks = 0             # Checks run by Z3
+        self.sat = 0
+        self.unsat = 0
+        self.unknown = 0
+        self.skipped = 0            # Checks not run, the budget being spent
+        self.time = 0.0             # Seconds spent in checks
+        self.conflicts = 0
+        self.memory = 0.0           # Peak memory of Z3, in MB
+
+    def __repr__(self):
+        return ("SolverStats({} checks: {} sat, {} unsat, {} unknown, {} skipped, "
+                "{:.2f}ms, {} conflicts, {:.2f}MB max memory)").format(
+            self.checks, self.sat, self.unsat, self.unknown, self.skipped,
+            self.time * 1000, self.conflicts, self.memory)
+
+    def record(self, status, elapsed, statistics, counted=0):
+        """
+        Record a check, given its result, its duration in seconds and the Z3
+        statistics of the solver right after it. The counters of a solver
+        add up over its checks: counted conflicts were recorded by the
+        previous ones.
+        """
+
+        self.checks += 1
+        if status == z3.sat:
+            self.sat += 1
+        elif status == z3.unsat:
+            self.unsat += 1
+        else:
+            self.unknown += 1
+        self.time += elapsed
+
+        # Memory is that of the process
+        values = {key: statistics.get_key_value(key) for key in statistics.keys()}
+        self.conflicts += values.get("conflicts", 0) - counted
+        self.memory = max(self.memory, values.get("max memory", 0.0))
+
+    def update(self, other):
+        """
+        Add the checks recorded by another SolverStats.
+        """
+
+        self.checks += other.checks
+        self.sat += other.sat
+        self.unsat += other.unsat
+        self.unknown += other.unknown
+        self.skipped += other.skipped
+        self.time += other.time
+        self.conflicts += other.conflicts
+        self.memory = max(self.memory, other.memory)
+
+
+class SolverCache:
+    """
+    Results of the path constraints of a CFG, keyed by path: a test for each
+    feasible path, and None for each infeasible one. Beyond maxsize results,
+    the least recently used are dropped.
+
+    The results of a CFG registered with cfgraph.utils.attach_cache can be
+    saved to the on-disk cache, and are loaded back on the next run.
+    """
+
+    def __init__(self, cfg, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+
+        # Key and entry name in the on-disk cache, basic-block paths being
+        # stored apart from statement paths
+        self.key = get_cache_key(cfg.graph.get("cfg", cfg))
+        self.name = "solver.blocks" if "cfg" in cfg.graph else "solver"
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        return "SolverCache({} results, {} hits, {} misses, {:.2f}% hit rate)".format(
+            len(self.results), self.hits, self.misses, self.hit_rate() * 100)
+
+    def hit_rate(self):
+        queries = self.hits + self.misses
+        return self.hits / queries if queries else 0.0
+
+    def clear(self):
+        self.results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, path):
+        """
+        Returns whether the result of path is known, and this result: a copy
+        of the test found, or None.
+        """
+
+        path = tuple(path)
+        if path not in self.results:
+            self.misses += 1
+            return False, None
+
+        self.hits += 1
+        self.results.move_to_end(path)
+        result = self.results[path]
+        return True, None if result is None else dict(result)
+
+    def add(self, path, result):
+        """
+        Record the result of path: a test of python values, or None if it is
+        infeasible.
+        """
+
+        self.results[tuple(path)] = None if result is None else dict(result)
+        self.results.move_to_end(tuple(path))
+        while len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+    def load(self):
+        """
+        Add the results saved in the on-disk cache, if any.
+        """
+
+        if self.key is None:
+            return
+        results = cache.load(self.key, self.name)
+        if results is not None:
+            for path, result in results:
+                self.results.setdefault(path, result)
+            while len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+
+    def save(self):
+        """
+        Save the results to the on-disk cache, from the least recently used.
+        Does nothing for CFGs outside of the cache.
+        """
+
+        if self.key is not None:
+            cache.store(self.key, self.name, list(self.results.items()))
+
+
+def get_solver_cache(cfg):
+    """
+    Returns the SolverCache of a CFG, shared by generate_test and the
+    PathSolvers of the CFG, and loaded from the on-disk cache on first use.
+    """
+
+    if cfg not in _caches:
+        _caches[cfg] = SolverCache(cfg)
+        _caches[cfg].load()
+    return _caches[cfg]
+
+
+class PathSolver:
+    """
+    Incremental solver of the paths of a CFG.
+
+    Constraints are asserted edge by edge, each in its own push/pop scope of
+    a single Z3 solver, along with the symbols it creates. They are only
+    checked on demand, usually at the end of a path. Moving to another
+    path only pops the edges after the prefix both paths share, and pushes
+    the new ones: paths coming from a depth-first search, as those of
+    gen_k_paths and gen_i_loops, are solved in time proportional to the size
+    of the path tree rather than to the sum of their lengths. Z3 keeps what
+    it learnt on a prefix for the checks of the paths extending it.
+
+    An isolated PathSolver has its own Z3 context and SolverCache, so that
+    the tests it finds only depend on the queries it is given, whatever was
+    solved before in the process.
+
+    Each check is given timeout milliseconds, and all of them budget
+    seconds: once the budget is spent, paths missing from the cache are
+    left undecided without being checked. Checks are recorded in
+    self.stats.
+    """
+
+    def __init__(self, cfg, isolated=False, timeout=TIMEOUT, budget=None):
+        self.cfg = cfg
+        self.isolated = isolated
+        self.s = None               # Z3 solver, see get_solver
+        self.timeout = timeout
+        self.budget = budget
+        self.limit = None           # Timeout set on the Z3 solver
+        self.stats = SolverStats()
+        self.dead = get_dead_assignments(cfg.graph.get("cfg", cfg))
+
+        self.path = list()          # Nodes of the current path
+        self.symbols = defaultdict(list)
+        self.inputs = set()
+        self.frames = list()        # Symbols and inputs before each edge
+
+        self.pruned = 0             # Infeasible prefixes found by is_feasible
+
+        self.cache = SolverCache(cfg) if isolated else get_solver_cache(cfg)
+        self.queries = 0
+        self.hits = 0               # Queries answered by the cache
+
+    def get_solver(self):
+        """
+        Returns the Z3 solver, created on first use: Z3 is not even loaded
+        when the cache answers all the queries.
+        """
+
+        if self.s is None:
+            # Models depend on the terms Z3 built before: an isolated solver
+            # has a context of its own
+            load_z3()
+            ctx = z3.Context() if self.isolated else None
+            self.s = z3.Solver(ctx=ctx)
+        return self.s
+
+    def extend(self, node):
+        """
+        Append a node to the current path, asserting the constraints of the
+        edge leading to it.
+        """
+
+        if self.path:
+            edge = self.cfg.edges[self.path[-1], node]
+            self.frames.append(({name: len(symbols) for name, symbols in self.symbols.items()},
+                                set(self.inputs)))
+            self.get_solver().push()
+            add_edge(self.s, self.symbols, edge, self.inputs, self.dead)
+
+        self.path.append(node)
+
+    def retract(self, count=1):
+        """
+        Remove the last nodes of the current path, with their constraints.
+        """
+
+        count = min(count, len(self.path))
+        edges = min(count, len(self.frames))
+
+        if edges:
+            self.s.pop(edges)
+            sizes, self.inputs = self.frames[-edges]
+            del self.frames[-edges:]
+
+            for name in list(self.symbols):
+                if name in sizes:
+                    del self.symbols[name][sizes[name]:]
+                else:
+                    del self.symbols[name]
+
+        del self.path[len(self.path) - count:]
+
+    def follow(self, path):
+        """
+        Make path the current path, keeping the constraints of the prefix it
+        shares with the current one.
+        """
+
+        common = 0
+        for current_node, node in zip(self.path, path):
+            if current_node != node:
+                break
+            common += 1
+
+        self.retract(len(self.path) - common)
+        for node in path[common:]:
+            self.extend(node)
+
+    def lookup(self, path):
+        """
+        Look path up in the cache, see SolverCache.lookup.
+        """
+
+        self.queries += 1
+        hit, result = self.cache.lookup(path)
+        self.hits += hit
+        return hit, result
+
+    def run_check(self):
+        """
+        Check the current path with Z3, within the time left, and record its
+        result in the cache unless it is UNKNOWN.
+
+        Returns:
+            result -- a test following the current path, None if it is
+                      infeasible, or UNKNOWN
+        """
+
+        timeout = self.timeout
+        if self.budget is not None:
+            left = self.budget - self.stats.time
+            if left <= 0:
+                self.stats.skipped += 1
+                return UNKNOWN
+            left = max(int(left * 1000), 1)
+            timeout = min(timeout, left) if timeout else left
+
+        s = self.get_solver()
+        if timeout and timeout != self.limit:
+            s.set("timeout", timeout)
+            self.limit = timeout
+
+        # self.stats only holds the checks of this solver
+        _, result = check_path(s, self.symbols, self.inputs, self.stats, self.stats.conflicts)
+        if result is not UNKNOWN:
+            self.cache.add(self.path, result)
         return result
-    except:
-        if verbose:
-            print(f"No test found for path {path}")
-        return None
 
+    def check(self):
+        """
+        Returns a test following the current path, None if it is infeasible,
+        or UNKNOWN.
+        """
+
+        hit, result = self.lookup(self.path)
+        if not hit:
+            result = self.run_check()
+        return result
+
+    def solve(self, path):
+        """
+        Returns a test following path, None if it is infeasible, or UNKNOWN.
+        """
+
+        hit, result = self.lookup(path)
+        if not hit:
+            self.follow(path)
+            result = self.run_check()
+        return result
+
+    def is_feasible(self, path):
+        """
+        Whether some test follows path, a prefix of the paths to be solved.
+        Paths the solver cannot decide are deemed feasible.
+
+        Oracle of gen_k_paths and gen_i_loops: the prefixes rejected are
+        counted in self.pruned.
+        """
+
+        hit, result = self.lookup(path)
+        if not hit:
+            self.follow(path)
+            result = self.run_check()
+        feasible = result is not None
 
-def new_symbol(name, symbols):
-    symbol = Int("_" + name + "_" + str(len(symbols[name])))
+        if not feasible:
+            self.pruned += 1
+        return feasible
+
+
+def new_symbol(name, symbols, ctx=None):
+    symbol = z3.Int("_" + name + "_" + str(len(symbols[name])), ctx)
     symbols[name].append(symbol)
 
     if VERBOSE:
@@ -77,12 +529,12 @@ def get_aexp_symbol(s, symbols, aexp):
 
     elif isinstance(aexp, AVariable):
         if not aexp.name in symbols:
-            new_symbol(aexp.name, symbols)
+            new_symbol(aexp.name, symbols, s.ctx)
 
         return symbols[aexp.name][-1]
 
     elif isinstance(aexp, AUnOp):
-        reg = new_symbol("_reg", symbols)
+        reg = new_symbol("_reg", symbols, s.ctx)
         child_symbol = get_aexp_symbol(s, symbols, aexp.child)
         if aexp.op == '-':
             s.add(reg + child_symbol == 0)
@@ -93,7 +545,7 @@ def get_aexp_symbol(s, symbols, aexp):
         return reg
 
     elif isinstance(aexp, ABinOp):
-        reg = new_symbol("_reg", symbols)
+        reg = new_symbol("_reg", symbols, s.ctx)
         left_symbol = get_aexp_symbol(s, symbols, aexp.left)
         right_symbol = get_aexp_symbol(s, symbols, aexp.right)
         if aexp.op == '+':
@@ -126,7 +578,7 @@ def get_bexp_symbol(s, symbols, bexp):
     elif isinstance(bexp, BUnOp):
         child_symbol = get_bexp_symbol(s, symbols, bexp.child)
         if bexp.op == '!':
-            return Not(child_symbol)
+            return z3.Not(child_symbol, s.ctx)
         else:
             raise TypeError("Unknown unary boolean operator {}".format(bexp.op))
 
@@ -141,11 +593,11 @@ def get_bexp_symbol(s, symbols, bexp):
             raise TypeError("Unknown binary boolean subtypes {}".format(bexp.subtypes))
 
         if bexp.op == '&&':
-            return And(left_symbol, right_symbol)
+            return z3.And(left_symbol, right_symbol, s.ctx)
         elif bexp.op == '||':
-            return Or(left_symbol, right_symbol)
+            return z3.Or(left_symbol, right_symbol, s.ctx)
         elif bexp.op == '^':
-            return Xor(left_symbol, right_symbol)
+            return z3.Xor(left_symbol, right_symbol, s.ctx)
         elif bexp.op == '==':
             return left_symbol == right_symbol
         elif bexp.op == '!=':
@@ -162,19 +614,35 @@ def get_bexp_symbol(s, symbols, bexp):
             raise TypeError("Unknown binary boolean operator {}".format(bexp.op))
 
 
-def add_stmt(s, symbols, stmt, inputs):
-    if isinstance(stmt, SInput):
+def add_edge(s, symbols, edge, inputs, dead=frozenset()):
+    if isinstance(edge["stmt"], SSkip):
+        s.add( get_bexp_symbol(s, symbols, edge["bexp"]) )
+    else:
+        add_stmt(s, symbols, edge["stmt"], inputs, dead)
+
+
+def add_stmt(s, symbols, stmt, inputs, dead=frozenset()):
+    if getattr(stmt, "label", None) in dead:
+        # Dead assignment, see cfgraph.dataflow.get_dead_assignments
+        pass
+
+    elif isinstance(stmt, SInput):
         varname = stmt.child.name
         inputs.add(varname)
-        new_symbol(varname, symbols)
+        new_symbol(varname, symbols, s.ctx)
 
     elif isinstance(stmt, SAssign):
         # The order here is *very* important
         reg_symbol = get_aexp_symbol(s, symbols, stmt.aexp)
-        var_symbol = new_symbol(stmt.var.name, symbols)
+        var_symbol = new_symbol(stmt.var.name, symbols, s.ctx)
 
         s.add(var_symbol == reg_symbol)
 
+    elif isinstance(stmt, SSequence):
+        # Basic block of a compacted CFG
+        for child in stmt.stmts:
+            add_stmt(s, symbols, child, inputs, dead)
+
     elif isinstance(stmt, SSkip) or isinstance(stmt, SPrint):
         pass
 
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Runtime errors of guards are kept by utils.simplify.
+"""
+
+# Append parentdir to import path
+import os, sys
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import signal
+
+import pytest
+
+from astree.aexp import *
+from astree.bexp import *
+from astree.stmt import *
+from cfgraph.runners import interpret_test, run_test
+from utils.ast2cfg import ast2cfg
+from utils.simplify import simplify, simplify_bexp
+
+
+# x / 0 == 1, failing whatever x
+DIVISION = BBinOp('==', ABinOp('/', AVariable('x'), AConstant(0)), AConstant(1))
+
+# z > 0, failing when z is unset
+UNSET = BBinOp('>', AVariable('z'), AConstant(0))
+
+
+def timeout(signum, frame):
+    raise TimeoutError
+
+
+def run(stmt, state):
+    # Run with the interpreter and the compiled runner, which must agree
+    cfg = ast2cfg(stmt)
+    signal.signal(signal.SIGALRM, timeout)
+    signal.alarm(5)
+    try:
+        result = interpret_test(cfg, dict(state))
+        assert run_test(cfg, dict(state)) == result
+        return result
+    finally:
+        signal.alarm(0)
+
+
+def empty_if(guard):
+    # 0: x := 1; 1: if (guard) { 2: if (false) { 3: y := 1; } } 4: y := 2;
+    return SSequence(SAssign(AVariable('x'), AConstant(1), label=0),
+                     SIf(guard,
+                         SIf(BConstant(False), SAssign(AVariable('y'), AConstant(1), label=3),
+                             SSkip(), label=2),
+                         SSkip(), label=1),
+                     SAssign(AVariable('y'), AConstant(2), label=4))
+
+
+@pytest.mark.parametrize("guard, error", [(DIVISION, ZeroDivisionError), (UNSET, KeyError)])
+def test_empty_if_keeps_failing_guard(guard, error):
+    ast = empty_if(guard)
+    simplified = simplify(ast)
+
+    assert any(isinstance(stmt, SIf) for stmt in simplified.stmts)
+    with pytest.raises(error):
+        run(ast, {})
+    with pytest.raises(error):
+        run(simplified, {})
+
+
+@pytest.mark.parametrize("state", [{'z': 1}, {'z': -1}])
+def test_empty_if_runs_past_kept_guard(state):
+    ast = empty_if(UNSET)
+    simplified = simplify(ast)
+
+    assert any(isinstance(stmt, SIf) for stmt in simplified.stmts)
+    assert run(simplified, state) == (['START', 0, 1, 4, 'END'], dict(state, x=1, y=2))
+
+
+def test_empty_if_keeps_guard_on_input():
+    # Input statements leave the state untouched when tests run
+    ast = SSequence(SInput(AVariable('z'), label=5), empty_if(UNSET))
+    simplified = simplify(ast)
+
+    with pytest.raises(KeyError):
+        run(simplified, {})
+
+
+def test_empty_if_drops_total_guard():
+    guard = BBinOp('>', AVariable('x'), AConstant(0))
+    ast = SSequence(SAssign(AVariable('x'), AConstant(1), label=0),
+                    SIf(guard, SSkip(label=2), SSkip(label=3), label=1),
+                    SAssign(AVariable('y'), AConstant(2), label=4))
+
+    simplified = simplify(ast)
+
+    assert simplified.stmts == (ast.stmts[0], ast.stmts[2])
+
+
+@pytest.mark.parametrize("guard, error", [(DIVISION, ZeroDivisionError), (UNSET, KeyError)])
+@pytest.mark.parametrize("op, constant", [('&&', False), ('||', True)])
+def test_short_circuit_keeps_failing_left_operand(guard, error, op, constant):
+    bexp = BBinOp(op, guard, BConstant(constant))
+    simplified = simplify_bexp(bexp, frozenset('x'))
+
+    assert simplified is bexp
+    with pytest.raises(error):
+        simplified.compile()({'x': 1})
+
+
+@pytest.mark.parametrize("guard", [DIVISION, UNSET])
+@pytest.mark.parametrize("op, constant", [('&&', False), ('||', True)])
+def test_short_circuit_drops_right_operand(guard, op, constant):
+    # The right operand is never evaluated
+    simplified = simplify_bexp(BBinOp(op, BConstant(constant), guard))
+
+    assert isinstance(simplified, BConstant) and simplified.value == constant
+
+
+@pytest.mark.parametrize("op, constant", [('&&', False), ('||', True)])
+def test_short_circuit_drops_total_left_operand(op, constant):
+    bexp = BBinOp(op, UNSET, BConstant(constant))
+
+    simplified = simplify_bexp(bexp, frozenset('z'))
+
+    assert isinstance(simplified, BConstant) and simplified.value == constant
@@ -7,14 +7,23 @@ import copy
 import os, sys
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
 
+from cfgraph.coverage import Coverage
+from cfgraph.paths import PathTable
 from cfgraph.utils import *
 from utils.printer import timeit
 
 class Tester():
-    # TODO: Avoid checking non-reachable paths (e.g. if False ...)
+    # TODO: Avoid checking non-reachable paths (constant guards such as
+    # if (false) are already removed by utils.simplify)
 
     def __init__(self, cfg):
+        # Criteria are expressed on statement labels: a basic-block CFG is
+        # replaced by the CFG it was compacted from, and paths through it are
+        # expanded by each test
+        self.blocks = cfg
+        cfg = cfg.graph.get("cfg", cfg)
         self.cfg = cfg
+        self.def_ref = get_def_ref_index(cfg)
         self.assignments = get_assignments(cfg)
         self.decisions = get_decisions(cfg)
         self.distances = get_distances(cfg)
@@ -22,13 +31,19 @@ class Tester():
         self.all_defs = get_all_def(cfg)
         self.usages = get_all_usages(cfg)
         self.du_paths = get_all_du_paths(cfg)
+        self.du_index = get_du_path_index(cfg)
 
 
     @timeit
     def test_assignments(self, paths):
-        assignments = self.assignments.copy()
-        for path in paths:
-            assignments = assignments.difference(set(path))
+        if isinstance(paths, Coverage):
+            # Counts of tests run by cfgraph.runners.count_test_set
+            assignments = paths.get_uncovered_nodes(self.assignments)
+        else:
+            paths = self.expand_paths(paths)
+            assignments = self.assignments.copy()
+            for path in paths:
+                assignments = assignments.difference(set(path))
 
         if assignments:
             print(f"Uncovered assignments: {assignments}")
@@ -39,10 +54,14 @@ class Tester():
 
     @timeit
     def test_decisions(self, paths):
-        decisions = self.decisions.copy()
-        for path in paths:
-            for i in range(len(path) - 1):
-                decisions.discard((path[i], path[i+1]))
+        if isinstance(paths, Coverage):
+            decisions = paths.get_uncovered_edges(self.decisions)
+        else:
+            paths = self.expand_paths(paths)
+            decisions = self.decisions.copy()
+            for path in paths:
+                for i in range(len(path) - 1):
+                    decisions.discard((path[i], path[i+1]))
 
         if decisions:
             print(f"Uncovered decisions: {decisions}")
@@ -53,6 +72,7 @@ class Tester():
 
     @timeit
     def test_k_path(self, paths, k):
+        paths = self.expand_paths(paths)
         missing_paths = list()
         counter = 0
 
@@ -69,6 +89,7 @@ class Tester():
 
     @timeit
     def test_i_loop(self, paths, i):
+        paths = self.expand_paths(paths)
         missing_loops = list()
         counter = 0
 
@@ -92,16 +113,22 @@ class Tester():
         :return: dict containing var:{unused def} entries
         """
 
+        paths = self.expand_paths(paths)
+
         # Dict containing var:{all nodes defining var} entries
         all_defs = copy.deepcopy(self.all_defs)
 
         for path in paths:
+            # Position of the first run of each node
+            first_pos = dict()
+            for pos, node in enumerate(path):
+                first_pos.setdefault(node, pos)
+
             for var in all_defs.keys():
                 # Get nodes defining var in path
-                path_defs = [def_node for def_node in all_defs[var] if def_node in path]
+                path_defs = [def_node for def_node in all_defs[var] if def_node in first_pos]
                 for def_node in path_defs:
-                    def_node_pos = path.index(def_node)
-                    if self.next_ref_pos(path, var, def_node_pos+1) > -1:
+                    if self.next_ref_pos(path, var, first_pos[def_node]+1) > -1:
                         all_defs[var].remove(def_node)
 
         # Clean result
@@ -112,14 +139,15 @@ class Tester():
 
     @timeit
     def test_usages(self, paths):
-        # TODO: Probably doesn't work on loops (or does it ?)
+        paths = self.expand_paths(paths)
         usages = copy.deepcopy(self.usages)
 
         for path in paths:
             for var in usages.keys():
-                path_defs = [def_node for def_node in usages[var].keys() if def_node in path]
-                for def_node in path_defs:
-                    def_node_pos = path.index(def_node)
+                # Each run of a definition in a loop may reach another usage
+                for def_node_pos, def_node in enumerate(path):
+                    if def_node not in usages[var]:
+                        continue
                     ref_node_pos = self.next_ref_pos(path, var, def_node_pos+1)
                     if ref_node_pos > -1:
                         usages[var][def_node].discard(path[ref_node_pos])
@@ -134,13 +162,13 @@ class Tester():
 
     @timeit
     def test_du_paths(self, paths):
-        du_paths = copy.deepcopy(self.du_paths)
+        paths = self.expand_paths(paths)
+        covered = set()
 
         for path in paths:
-            local_du_paths = copy.deepcopy(du_paths)
-            for du_path in local_du_paths:
-                if Tester.path_in_path(du_path, path) > -1:
-                    du_paths.remove(du_path)
+            covered |= self.du_index.get_covered(path)
+
+        du_paths = [du_path for du_id, du_path in enumerate(self.du_index.paths) if du_id not in covered]
 
         for path in du_paths:
             print(f"Paths {path} is not covered")
@@ -149,6 +177,14 @@ class Tester():
         return du_paths
 
 
+    def expand_paths(self, paths):
+        # Paths are either lists of nodes, or a PathTable (see
+        # cfgraph.runners.record_test_set), kept as is for fast lookups
+        if isinstance(paths, PathTable) and paths.cfg is self.cfg:
+            return paths
+        return [expand_path(self.blocks, path) for path in paths]
+
+
     @staticmethod
     def path_in_path(subpath, path):
         test_path = path[:]
@@ -162,25 +198,29 @@ class Tester():
 
 
     def next_ref_pos(self, path, var, start_pos, allow_def=False):
-        for idx, node in enumerate(path[start_pos:]):
-            if not allow_def and var in get_def(self.cfg, node):
+        # Bitmasks of the def/ref index, see cfgraph.utils.get_def_ref_index
+        bit = self.def_ref.bits.get(var, 0)
+        def_masks = self.def_ref.def_masks
+        ref_masks = self.def_ref.ref_masks
+
+        for idx in range(start_pos, len(path)):
+            node = path[idx]
+            if not allow_def and def_masks[node] & bit:
                 return -1
-            if var in get_ref(self.cfg, node):
-                return idx+start_pos
+            if ref_masks[node] & bit:
+                return idx
         return -1
 
 
 if __name__ == "__main__":
     from cfgraph.runners import run_test_set
-    from syntax.parser import parser
-    from utils.ast2cfg import ast2cfg
+    from utils.loader import load_program
 
     filename = sys.argv[1]
     with open(filename) as f:
         source_code = f.read()
 
-    ast = parser.parse(source_code)
-    cfg = ast2cfg(ast)
+    ast, cfg = load_program(source_code, blocks="--blocks" in sys.argv[2:])
 
     test_set= [{'x': 0},
                {'x': -1},
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import copy
 import networkx as nx
 
 from astree.bexp import *
 from astree.stmt import *
 
+
+# Guard and statement of unconditional edges, shared by all of them
+TRUE = BConstant(True)
+SKIP = SSkip()
+
+
 def add_start_node(cfg):
     cfg.add_node("START")
     return cfg
@@ -17,34 +22,111 @@ def add_end_node(cfg):
     return cfg
 
 
-def ast2cfg(ast):
-    ast = copy.deepcopy(ast)
+def ast2cfg(ast, blocks=False):
+    """
+    Build the control flow graph of a program.
+
+    The AST is neither copied nor modified: edges reference its guards and
+    statements, and negated guards are new BUnOp nodes wrapping the original
+    guard. The CFG is thus built in linear time and memory.
+
+    Arguments:
+        ast    -- AST of the program
+        blocks -- whether to compact the CFG into basic blocks, see compact_cfg
+    """
+
     cfg = nx.DiGraph()
 
     add_start_node(cfg)
 
-    cfg, dangling_edges = recursive_ast2cfg({("START", BConstant(True), SSkip())}, ast, cfg)
+    cfg, dangling_edges = recursive_ast2cfg([("START", TRUE, SKIP)], ast, cfg)
 
     add_end_node(cfg)
 
     for previous_node, bexp, stmt in dangling_edges:
         cfg.add_edge(previous_node, "END", bexp=bexp, stmt=stmt)
 
+    if blocks:
+        return compact_cfg(cfg)
+
     return cfg
 
 
+def compact_cfg(cfg):
+    """
+    Merge straight-line runs of statements into basic blocks.
+
+    A statement node whose single successor is also a statement node, with
+    no other predecessor, is absorbed in the block of its predecessor. The
+    block is labeled by its first statement, and its leaving edge carries an
+    SSequence of the statements of the block, so that runners and the solver
+    handle it as any other edge.
+
+    Each node of the result has a "labels" attribute, listing the labels of
+    the statements of its block, and the graph keeps the original CFG in
+    graph["cfg"]. See cfgraph.utils.expand_path to map paths back.
+
+    Arguments:
+        cfg -- control flow graph from ast2cfg
+
+    Returns:
+        blocks -- the compacted control flow graph
+    """
+
+    def is_statement(node):
+        # Node running its statement on a single unconditional edge
+        return node not in ["START", "END"] and "type" not in cfg.nodes[node]
+
+    def is_absorbed(node):
+        if not is_statement(node) or cfg.in_degree(node) != 1:
+            return False
+        previous_node = next(iter(cfg.predecessors(node)))
+        return previous_node != node and is_statement(previous_node)
+
+    blocks = nx.DiGraph(cfg=cfg)
+
+    for node, data in cfg.nodes(data=True):
+        if is_absorbed(node):
+            continue
+
+        labels = [node]
+        if is_statement(node):
+            stmts = list()
+            current_node = node
+            while True:
+                next_node, edge = next(iter(cfg.adj[current_node].items()))
+                stmts.append(edge["stmt"])
+                if next_node == node or not is_absorbed(next_node):
+                    break
+                labels.append(next_node)
+                current_node = next_node
+
+            stmt = stmts[0] if len(stmts) == 1 else SSequence(*stmts)
+            blocks.add_edge(node, next_node, bexp=TRUE, stmt=stmt)
+        else:
+            for next_node, edge in cfg.adj[node].items():
+                blocks.add_edge(node, next_node, **edge)
+
+        blocks.add_node(node, labels=tuple(labels), **data)
+
+    return blocks
+
+
 def recursive_ast2cfg(previous_edges, ast, cfg):
     """
         This function does the actual conversion from ast to cfg.
         It takes some half-edges (one node + edge properties) an ast, and a cfg.
-        It returns an updated cfg and some other half-edges.
+        It returns an updated cfg and some other half-edges, as a new list.
         Event if each type of AST should be treated differently, there are somme common points :
         SAssign, SIf and SWhile all create a node with the label of the assign/if/while instruction.
         This part is factorized for lisibility.
 
-        TODO: SSkip needs to be properly handled
+        SSkip creates nothing, the half-edges are passed through.
     """
 
+    if isinstance(ast, SSkip):
+        return cfg, list(previous_edges)
+
     if not isinstance(ast, SSequence):
         # If ast is assign/if/while, we can create a top-level node and link dangling edges to it
         if isinstance(ast, SWhile):
@@ -58,48 +140,40 @@ def recursive_ast2cfg(previous_edges, ast, cfg):
 
     if isinstance(ast, SAssign) or isinstance(ast, SInput) or isinstance(ast, SPrint):
         # Assign: simply return an half-edge with the assignment AST as stmt.
-            return cfg, {(ast.label, BConstant(True), ast)}
+        return cfg, [(ast.label, TRUE, ast)]
     elif isinstance(ast, SIf):
         # If: convert "if condition true" ast, link top-level node to it with condition true,
         # then convert "if condition false" ast, link top-level node to it with ! (not) condition.
-        bexp, ctrue, cfalse = ast.children
-        cfg, true_branch_dangling_edges = recursive_ast2cfg(
-            {
-                (ast.label, bexp, SSkip())
-            }, ctrue, cfg)
-        if not isinstance(cfalse, SSkip):
-            cfg, false_branch_dangling_edges = recursive_ast2cfg(
-                {
-                    (ast.label, BUnOp("!", bexp), SSkip())
-                }, cfalse, cfg)
-            # Gather all dangling edges leaving those newly converted cfg parts and return them
-            true_branch_dangling_edges.update(false_branch_dangling_edges)
-        else:
-            true_branch_dangling_edges.update([(ast.label, BUnOp("!", bexp), SSkip())])
-        return cfg, true_branch_dangling_edges
+        # The negation wraps the guard without altering it.
+        true_edge = (ast.label, ast.bexp, SKIP)
+        false_edge = (ast.label, BUnOp("!", ast.bexp), SKIP)
+        cfg, true_branch_dangling_edges = recursive_ast2cfg([true_edge], ast.strue, cfg)
+        cfg, false_branch_dangling_edges = recursive_ast2cfg([false_edge], ast.sfalse, cfg)
+        if true_branch_dangling_edges == [true_edge] and false_branch_dangling_edges == [false_edge]:
+            # Both branches are empty, and their edges would join the same
+            # successor, which a DiGraph holds once: leave on a single edge,
+            # whose guard still evaluates, and possibly fails
+            return cfg, [(ast.label, BBinOp("||", ast.bexp, false_edge[1]), SKIP)]
+        # Gather all dangling edges leaving those newly converted cfg parts and return them
+        return cfg, true_branch_dangling_edges + false_branch_dangling_edges
     elif isinstance(ast, SSequence):
         # Sequence is different : no top-level node.
         # We sequentially convert all sub-ast of sequence ast, passing dangling edges from one
-        # to the next one
-        # Copy previous_edges to avoid modifying it
-        edges_to_transfer = copy.deepcopy(previous_edges)
-        for sub_ast in list(ast.children):
+        # to the next one. Each conversion returns a new list, previous_edges is left untouched.
+        edges_to_transfer = previous_edges
+        for sub_ast in ast.stmts:
             cfg, edges_to_transfer = recursive_ast2cfg(edges_to_transfer, sub_ast, cfg)
         # Return dangling edges at the end of the conversion
-        return cfg, edges_to_transfer
+        return cfg, list(edges_to_transfer)
     elif isinstance(ast, SWhile):
         # We convert the "condition true" sub ast
-        bexp, ctrue = ast.children
         cfg, true_branch_dangling_edges = recursive_ast2cfg(
-            {
-                (ast.label, bexp, SSkip())
-            }, ctrue, cfg
-        )
+            [(ast.label, ast.bexp, SKIP)], ast.stmt, cfg)
         # And we link output dangling edges to the top level-node to actually create the loop
         for previous_node, bexp, stmt in true_branch_dangling_edges:
             cfg.add_edge(previous_node, ast.label, bexp=bexp, stmt=stmt)
         # Return an half-edge that will be followed if while condition does not apply
-        return cfg, {(ast.label, BUnOp("!", ast.children[0]), SSkip())}
+        return cfg, [(ast.label, BUnOp("!", ast.bexp), SKIP)]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,884 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmarks for the toolchain.
+
+Usage: python utils/benchmark.py [name ...]
+"""
+
+# Append parentdir to import path
+import os, sys
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import random
+import subprocess
+import time
+import tracemalloc
+
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY_MODULES = ["anytree", "matplotlib", "networkx", "pygraphviz", "z3"]
+
+
+def cold_import(statement, repeat=5):
+    """
+    Time a statement in fresh interpreters, and list the heavy modules it loads.
+
+    Arguments:
+        statement -- python code to run, usually an import
+        repeat    -- number of interpreters to start
+
+    Returns:
+        best   -- best wall time in seconds
+        loaded -- heavy modules found in sys.modules afterwards
+    """
+
+    code = (
+        "import sys, time\n"
+        "ts = time.perf_counter()\n"
+        f"{statement}\n"
+        "te = time.perf_counter()\n"
+        f"print(te - ts, ' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+
+    best = float("inf")
+    loaded = ""
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR,
+                                check=True, capture_output=True, text=True).stdout.split()
+        best = min(best, float(output[0]))
+        loaded = " ".join(output[1:])
+
+    return best, loaded
+
+
+def bench_imports():
+    """
+    Cold-start cost of the entry points, compared to the heavy dependencies
+    they used to pull in eagerly.
+    """
+
+    statements = [
+        "import utils.interpreter",
+        "from tests.testor import Tester",
+        "import tests.generator",
+        "import main",
+    ] + [f"import {module}" for module in HEAVY_MODULES]
+
+    for statement in statements:
+        try:
+            best, loaded = cold_import(statement)
+        except subprocess.CalledProcessError:
+            print(f"{statement:<40} unavailable")
+            continue
+        print(f"{statement:<40} {best * 1000:8.2f}ms   loads: {loaded or '-'}")
+
+
+def gen_program(n, seed=0):
+    """
+    Generate the source of a straight-line program of about n AST nodes,
+    made of assignments to a few variables.
+    """
+
+    rng = random.Random(seed)
+    names = ["x", "y", "z", "t"]
+    lines = [f"{label}: {name} := {label};" for label, name in enumerate(names)]
+    label = len(lines)
+    nodes = 0
+
+    while nodes < n:
+        name = rng.choice(names)
+        a, b, c = rng.choice(names), rng.choice(names), rng.randint(1, 9)
+        lines.append(f"{label}: {name} := ({a} + {b} * {c}) % 1000 - {c};")
+        label += 1
+        nodes += 10
+
+    return "\n".join(lines)
+
+
+def bench_ast(n=100000):
+    """
+    Memory footprint and evaluation time of a generated program of n nodes.
+    """
+
+    from syntax.parser import parser
+
+    source_code = gen_program(n)
+
+    tracemalloc.start()
+    ast = parser.parse(source_code)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"AST of {n} nodes: {size / 1024 / 1024:.2f}MiB ({size / n:.1f}B/node)")
+
+    ts = time.perf_counter()
+    ast.exec(dict(), verbose=False)
+    te = time.perf_counter()
+
+    print(f"First execution, compiling expressions: {(te - ts) * 1000:.2f}ms")
+
+    ts = time.perf_counter()
+    for _ in range(10):
+        ast.exec(dict(), verbose=False)
+    te = time.perf_counter()
+
+    print(f"Execution: {(te - ts) * 100:.2f}ms/run")
+
+
+def bench_guards(n=200000):
+    """
+    Tree-walking evaluation of a guard against its compiled closure.
+    """
+
+    from syntax.parser import parser
+
+    bexp = parser.parse("0: if (((x % 7 == 0) && (y > 3)) || !(x + y * 2 <= 10)) { 1: x := 0; }").bexp
+    states = [{"x": i, "y": i % 5} for i in range(n)]
+
+    ts = time.perf_counter()
+    expected = [bexp.eval(state) for state in states]
+    te = time.perf_counter()
+    print(f"eval:    {(te - ts) * 1e9 / n:.0f}ns/guard")
+
+    compiled = bexp.compile()
+    ts = time.perf_counter()
+    result = [compiled(state) for state in states]
+    te = time.perf_counter()
+    print(f"compile: {(te - ts) * 1e9 / n:.0f}ns/guard")
+
+    assert result == expected
+
+
+def bench_loops(n=1000000):
+    """
+    Per-iteration cost of a loop, with the explicit-stack engine and with the
+    tree-walking Stmt.exec.
+    """
+
+    from syntax.parser import parser
+    from utils.interpreter import execute
+
+    ast = parser.parse("""
+        0: i := 0;
+        1: s := 0;
+        2: while (i < n) {
+            3: s := s + i % 7;
+            4: i := i + 1;
+        }
+    """)
+
+    ts = time.perf_counter()
+    state = execute(ast, {"n": n}, verbose=False)
+    te = time.perf_counter()
+    print(f"execute:   {(te - ts) * 1e9 / n:.0f}ns/iteration")
+
+    ts = time.perf_counter()
+    expected = ast.exec({"n": n}, verbose=False)
+    te = time.perf_counter()
+    print(f"Stmt.exec: {(te - ts) * 1e9 / n:.0f}ns/iteration")
+
+    assert state == expected
+
+
+def gen_ast(n):
+    """
+    Build directly (the parser is quadratic on long sequences) a program of
+    n statements, alternating assignments, ifs and whiles.
+    """
+
+    from astree.aexp import AConstant, ABinOp, AVariable
+    from astree.bexp import BBinOp
+    from astree.stmt import SAssign, SIf, SSequence, SWhile
+
+    x, y = AVariable("x"), AVariable("y")
+    stmts = list()
+    label = 0
+    while label < n:
+        stmts.append(SAssign(x, ABinOp("+", x, AConstant(label)), label=label))
+        stmts.append(SIf(BBinOp("==", ABinOp("%", x, AConstant(3)), AConstant(0)),
+                         SAssign(y, ABinOp("+", y, AConstant(1)), label=label + 2),
+                         SAssign(y, ABinOp("-", y, AConstant(1)), label=label + 3),
+                         label=label + 1))
+        stmts.append(SWhile(BBinOp(">", y, AConstant(10)),
+                            SAssign(y, ABinOp("/", y, AConstant(2)), label=label + 5),
+                            label=label + 4))
+        label += 6
+
+    return SSequence(*stmts)
+
+
+def bench_cfg(sizes=(12500, 25000, 50000)):
+    """
+    Time and memory of ast2cfg on programs of growing size.
+    """
+
+    from utils.ast2cfg import ast2cfg
+
+    for n in sizes:
+        ast = gen_ast(n)
+
+        tracemalloc.start()
+        ts = time.perf_counter()
+        cfg = ast2cfg(ast)
+        te = time.perf_counter()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{n:>6} statements: {(te - ts) * 1000:8.2f}ms {size / 1024 / 1024:8.2f}MiB "
+              f"({cfg.number_of_nodes()} nodes, {cfg.number_of_edges()} edges)")
+
+
+def gen_ifs(n):
+    """
+    Generate the source of a program of n sequential if statements, with
+    2 ** n paths.
+    """
+
+    lines = ["0: x := 0;", "1: y := 0;"]
+    for i in range(n):
+        label = 2 + 2 * i
+        lines.append(f"{label}: if (x > {i}) {{ {label + 1}: y := y + x; }}")
+    lines.append(f"{2 + 2 * n}: x := y;")
+
+    return "\n".join(lines)
+
+
+def bench_usages(sizes=(10, 14, 100, 1000)):
+    """
+    Def-use chains of programs of sequential if statements, from the
+    reaching definitions analysis, and from the enumeration of simple paths
+    they replace (on small programs only).
+    """
+
+    import networkx as nx
+    from cfgraph.utils import get_all_def, get_all_usages, get_def, get_ref
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    def simple_paths_usages(cfg):
+        result = dict()
+        for var, def_nodes in get_all_def(cfg).items():
+            result[var] = dict()
+            for def_node in def_nodes:
+                result[var][def_node] = set()
+                for path in nx.all_simple_paths(cfg, def_node, "END"):
+                    for node in path[1:]:
+                        if var in get_def(cfg, node):
+                            break
+                        if var in get_ref(cfg, node):
+                            result[var][def_node].add(node)
+                            break
+        return result
+
+    for n in sizes:
+        cfg = ast2cfg(parser.parse(gen_ifs(n)))
+
+        ts = time.perf_counter()
+        usages = get_all_usages(cfg)
+        te = time.perf_counter()
+        line = f"{n:>5} ifs: dataflow {(te - ts) * 1000:10.2f}ms"
+
+        if n <= 14:
+            ts = time.perf_counter()
+            expected = simple_paths_usages(cfg)
+            te = time.perf_counter()
+            line += f"   simple paths {(te - ts) * 1000:10.2f}ms"
+            assert usages == expected
+
+        print(line)
+
+
+def bench_dupaths(sizes=(6, 9, 12)):
+    """
+    DU paths of programs of sequential if statements, searched from each
+    definition up to the next one, and from the enumeration of all the paths
+    to END deduplicated in a list, as they used to be.
+    """
+
+    from cfgraph.utils import gen_i_loops, get_all_def, get_all_du_paths, get_all_ref
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    def enumerated_du_paths(cfg):
+        result = list()
+        all_def = get_all_def(cfg)
+        all_ref = get_all_ref(cfg)
+        for var, def_nodes in all_def.items():
+            for def_node in def_nodes:
+                for path in gen_i_loops(cfg, i=1, start=def_node, end="END"):
+                    for idx, node in enumerate(path[1:]):
+                        if node in all_ref[var] and path[:idx+2] not in result:
+                            result.append(path[:idx+2])
+                        if node in all_def[var]:
+                            break
+        return result
+
+    for n in sizes:
+        cfg = ast2cfg(parser.parse(gen_ifs(n)))
+
+        ts = time.perf_counter()
+        du_paths = get_all_du_paths(cfg)
+        te = time.perf_counter()
+
+        ts2 = time.perf_counter()
+        expected = enumerated_du_paths(cfg)
+        te2 = time.perf_counter()
+
+        print(f"{n:>3} ifs, {len(du_paths):>6} DU paths: search {(te - ts) * 1000:10.2f}ms"
+              f"   enumeration {(te2 - ts2) * 1000:10.2f}ms")
+        assert du_paths == expected
+
+
+def bench_blocks(n=20000, repeat=20):
+    """
+    Size of the statement CFG against the basic-block CFG, and the time of
+    run_test on both, for the input programs and a straight-line program.
+    """
+
+    from cfgraph.runners import run_test
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+    from utils.simplify import simplify
+
+    programs = dict()
+    input_dir = os.path.join(SRC_DIR, "input")
+    for filename in sorted(os.listdir(input_dir)):
+        # Nested-while does not terminate on most inputs
+        if filename.endswith(".imp") and filename != "nested-while.imp":
+            with open(os.path.join(input_dir, filename)) as f:
+                programs[filename] = simplify(parser.parse(f.read()))
+    programs[f"straight-line ({n} nodes)"] = parser.parse(gen_program(n))
+
+    state = {name: 7 for name in ["x", "y", "z", "t", "p"]}
+
+    for name, ast in programs.items():
+        print(f"{name}:")
+        for blocks in [False, True]:
+            cfg = ast2cfg(ast, blocks=blocks)
+
+            ts = time.perf_counter()
+            for _ in range(repeat):
+                path, _ = run_test(cfg, state)
+            te = time.perf_counter()
+
+            print(f"    {'blocks' if blocks else 'labels'}: {cfg.number_of_nodes():>5} nodes, "
+                  f"path of {len(path):>5} nodes, run_test {(te - ts) * 1e6 / repeat:9.1f}us")
+
+
+def bench_frozen(n=20000, k=40, i=3):
+    """
+    interpret_test, gen_k_paths and gen_i_loops on the networkx CFG against
+    the array-backed FrozenCFG.
+    """
+
+    from cfgraph.frozen import freeze
+    from cfgraph.runners import interpret_test
+    from cfgraph.utils import gen_i_loops, gen_k_paths
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    cfg = ast2cfg(parser.parse("""
+        0: x := 0;
+        1: y := 0;
+        2: while (x < n) {
+            3: if (x % 3 == 0) {
+                4: y := y + x;
+            } else {
+                5: y := y - 1;
+            }
+            6: x := x + 1;
+        }
+    """))
+
+    for name, graph in [("networkx", cfg), ("frozen", freeze(cfg))]:
+        ts = time.perf_counter()
+        path, _ = interpret_test(graph, {"n": n})
+        te = time.perf_counter()
+        print(f"{name:>8}: interpret_test {(te - ts) * 1e9 / len(path):6.0f}ns/node", end="")
+
+        ts = time.perf_counter()
+        count = sum(1 for _ in gen_k_paths(graph, k))
+        te = time.perf_counter()
+        print(f", gen_k_paths {(te - ts) * 1e6 / count:6.1f}us/path", end="")
+
+        ts = time.perf_counter()
+        count = sum(1 for _ in gen_i_loops(graph, i))
+        te = time.perf_counter()
+        print(f", gen_i_loops {(te - ts) * 1e6 / count:6.1f}us/path")
+
+
+def bench_cache(n=5000):
+    """
+    Loading a program and its analyses in a fresh interpreter, with an empty
+    then a warm program cache.
+    """
+
+    import tempfile
+
+    input_dir = os.path.join(SRC_DIR, "input")
+    with open(os.path.join(input_dir, "prime-sieve.imp")) as f:
+        programs = {"prime-sieve.imp": f.read()}
+    programs[f"straight-line ({n} nodes)"] = gen_program(n)
+
+    code = (
+        "import sys, time\n"
+        "ts = time.perf_counter()\n"
+        "from cfgraph.utils import get_all_def, get_all_du_paths, get_all_usages, get_nested_swhile\n"
+        "from utils.loader import load_program\n"
+        "ast, cfg = load_program(sys.stdin.read())\n"
+        "get_all_def(cfg), get_all_du_paths(cfg), get_all_usages(cfg), get_nested_swhile(cfg)\n"
+        "print(time.perf_counter() - ts)\n"
+    )
+
+    for name, source_code in programs.items():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = dict(os.environ, IMP_CACHE_DIR=cache_dir)
+            times = list()
+            for _ in range(3):
+                output = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, env=env, input=source_code,
+                                        check=True, capture_output=True, text=True).stdout
+                times.append(float(output))
+
+        print(f"{name}: cold {times[0] * 1000:8.2f}ms, warm {min(times[1:]) * 1000:8.2f}ms")
+
+
+def bench_compiled(n=20000, tests=200):
+    """
+    run_test on the dispatch table against the interpreter, on the networkx
+    CFG and on the FrozenCFG, for one long execution then a set of tests.
+    """
+
+    from cfgraph.frozen import freeze
+    from cfgraph.runners import get_compiled, interpret_test, run_test, run_test_set
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    cfg = ast2cfg(parser.parse("""
+        0: x := 0;
+        1: y := 0;
+        2: while (x < n) {
+            3: if (x % 3 == 0) {
+                4: y := y + x;
+            } else {
+                5: y := y - 1;
+            }
+            6: x := x + 1;
+        }
+    """))
+
+    ts = time.perf_counter()
+    get_compiled(cfg)
+    te = time.perf_counter()
+    print(f"compile_cfg: {(te - ts) * 1000:.2f}ms")
+
+    frozen = freeze(cfg)
+    runners = [
+        ("interpret_test, networkx", lambda state: interpret_test(cfg, state)),
+        ("interpret_test, frozen", lambda state: interpret_test(frozen, state)),
+        ("run_test, compiled", lambda state: run_test(cfg, state)),
+    ]
+
+    expected = None
+    for name, runner in runners:
+        ts = time.perf_counter()
+        result = runner({"n": n})
+        te = time.perf_counter()
+        print(f"{name:<26} {(te - ts) * 1e9 / len(result[0]):6.0f}ns/node")
+
+        assert expected is None or result == expected
+        expected = result
+
+    valuations = [{"n": i} for i in range(tests)]
+    for name, function in [("interpret_test", interpret_test), ("run_test", run_test)]:
+        ts = time.perf_counter()
+        paths = [function(cfg, valuation)[0] for valuation in valuations]
+        te = time.perf_counter()
+        print(f"{tests} tests, {name:<16} {(te - ts) * 1000:8.2f}ms")
+
+    assert run_test_set(cfg, valuations) == paths
+
+
+def bench_batch(n=100000):
+    """
+    run_batch against run_test on n random valuations of the input programs.
+    """
+
+    from cfgraph.batch import run_batch
+    from cfgraph.runners import run_test
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    rng = random.Random(0)
+    input_dir = os.path.join(SRC_DIR, "input")
+
+    for filename in ["example3.imp", "if-in-while.imp", "simple-while.imp"]:
+        with open(os.path.join(input_dir, filename)) as f:
+            cfg = ast2cfg(parser.parse(f.read()))
+        valuations = [{name: rng.randint(-100, 100) for name in "xyz"} for _ in range(n)]
+
+        ts = time.perf_counter()
+        expected = [run_test(cfg, valuation) for valuation in valuations]
+        te = time.perf_counter()
+        print(f"{filename}: run_test {(te - ts) * 1000:8.2f}ms", end="")
+
+        ts = time.perf_counter()
+        path_ids, paths, states = run_batch(cfg, valuations)
+        te = time.perf_counter()
+        print(f", run_batch {(te - ts) * 1000:8.2f}ms ({len(paths)} paths)")
+
+        assert [(paths[path_id], state) for path_id, state in zip(path_ids, states)] == expected
+
+
+def bench_parallel(n=50000):
+    """
+    run_test_set against run_test_set_parallel with growing pools.
+    """
+
+    from cfgraph.runners import run_test_set, run_test_set_parallel
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    with open(os.path.join(SRC_DIR, "input", "simple-while.imp")) as f:
+        cfg = ast2cfg(parser.parse(f.read()))
+
+    rng = random.Random(0)
+    valuations = [{"x": rng.randint(-100, 300), "y": rng.randint(-100, 300)} for _ in range(n)]
+
+    ts = time.perf_counter()
+    expected = run_test_set(cfg, valuations)
+    te = time.perf_counter()
+    print(f"serial:    {(te - ts) * 1000:8.2f}ms")
+
+    for workers in sorted({2, 4, os.cpu_count() or 1}):
+        ts = time.perf_counter()
+        paths = run_test_set_parallel(cfg, valuations, workers=workers)
+        te = time.perf_counter()
+        print(f"{workers:>2} workers: {(te - ts) * 1000:8.2f}ms")
+
+        assert paths == expected
+
+
+def bench_paths(n=2000):
+    """
+    Memory of recorded paths as lists of labels against a PathTable, and
+    time of membership tests.
+    """
+
+    from cfgraph.runners import run_test_set
+    from cfgraph.paths import PathTable
+    from syntax.parser import parser
+    from utils.ast2cfg import ast2cfg
+
+    with open(os.path.join(SRC_DIR, "input", "simple-while.imp")) as f:
+        cfg = ast2cfg(parser.parse(f.read()))
+
+    rng = random.Random(0)
+    valuations = [{"x": rng.randint(-100, 300), "y": rng.randint(-100, 300)} for _ in range(n)]
+    paths = run_test_set(cfg, valuations)
+
+    tracemalloc.start()
+    lists = [list(path) for path in paths]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{n} paths as lists: {size / 1024:10.2f}KiB")
+
+    tracemalloc.start()
+    table = PathTable(cfg)
+    for path in paths:
+        table.add(path)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"PathTable:         {size / 1024:10.2f}KiB ({len(table)} distinct, {table.nbytes()}B encoded)")
+
+    ts = time.perf_counter()
+    found = sum(path in lists for path in paths[-200:])
+    te = time.perf_counter()
+    print(f"Lookup in lists:   {(te - ts) * 1000 / 200:10.4f}ms/path")
+
+    ts = time.perf_counter()
+    assert sum(path in table for path in paths[-200:]) == found
+    te = time.perf_counter()
+    print(f"Lookup in table:   {(te - ts) * 1000 / 200:10.4f}ms/path")
+
+
+def bench_coverage(n=5000):
+    """
+    Time and peak memory of decision coverage over n tests, from recorded
+    paths and from counters.
+    """
+
+    from cfgraph.runners import count_test_set, run_test_set
+    from syntax.parser import parser
+    from tests.testor import Tester
+    from utils.ast2cfg import ast2cfg
+
+    with open(os.path.join(SRC_DIR, "input", "simple-while.imp")) as f:
+        cfg = ast2cfg(parser.parse(f.read()))
+
+    rng = random.Random(0)
+    valuations = [{"x": rng.randint(-100, 300), "y": rng.randint(-100, 300)} for _ in range(n)]
+    tester = Tester(cfg)
+
+    def decisions(run):
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                return tester.test_decisions(run(cfg, valuations))
+            finally:
+                sys.stdout = stdout
+
+    results = list()
+    for name, run in [("paths", run_test_set), ("counters", count_test_set)]:
+        ts = time.perf_counter()
+        results.append(decisions(run))
+        te = time.perf_counter()
+
+        tracemalloc.start()
+        decisions(run)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{name:<9} {(te - ts) * 1000:10.2f}ms {peak / 1024 / 1024:10.2f}MiB peak")
+
+    assert results[0] == results[1]
+
+
+def bench_defref(n=200):
+    """
+    Tester.test_definitions and test_usages on long paths, with the def/ref
+    index, and with def/ref sets rebuilt from the edges at each node.
+    """
+
+    from cfgraph.runners import run_test_set
+    from syntax.parser import parser
+    from tests.testor import Tester
+    from utils.ast2cfg import ast2cfg
+
+    with open(os.path.join(SRC_DIR, "input", "simple-while.imp")) as f:
+        cfg = ast2cfg(parser.parse(f.read()))
+
+    rng = random.Random(0)
+    valuations = [{"x": rng.randint(0, 50), "y": rng.randint(0, 2000)} for _ in range(n)]
+    paths = run_test_set(cfg, valuations)
+    print(f"{n} paths of {sum(map(len, paths)) // n} nodes on average")
+
+    def scan_def(node):
+        result = set()
+        for edge in cfg.out_edges(node, data=True):
+            if edge[2]["stmt"].typename in ["SASSIGN", "SINPUT"]:
+                result = result.union(edge[2]["stmt"].def_var)
+        return result
+
+    def scan_ref(node):
+        result = set()
+        for edge in cfg.out_edges(node, data=True):
+            result = result.union(edge[2]["bexp"].vars)
+            result = result.union(edge[2]["stmt"].vars)
+        return result
+
+    class ScanningTester(Tester):
+        def next_ref_pos(self, path, var, start_pos, allow_def=False):
+            for idx, node in enumerate(path[start_pos:]):
+                if not allow_def and var in scan_def(node):
+                    return -1
+                if var in scan_ref(node):
+                    return idx+start_pos
+            return -1
+
+    results = list()
+    for name, tester in [("scanning", ScanningTester(cfg)), ("index", Tester(cfg))]:
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                ts = time.perf_counter()
+                results.append((tester.test_definitions(paths), tester.test_usages(paths)))
+                te = time.perf_counter()
+            finally:
+                sys.stdout = stdout
+        print(f"{name:<9} {(te - ts) * 1000:10.2f}ms")
+
+    assert results[0] == results[1]
+
+
+def bench_solver(k=14, n=6):
+    """
+    Tests of the paths of gen_k_paths, each solved by a fresh solver with
+    generate_test, and along the search by a PathSolver.
+    """
+
+    from cfgraph.utils import gen_k_paths
+    from syntax.parser import parser
+    from tests.solver import PathSolver, generate_test, get_solver_cache
+    from utils.ast2cfg import ast2cfg
+
+    programs = dict()
+    for filename in ["if-in-while.imp", "prime-sieve.imp", "simple-while.imp"]:
+        with open(os.path.join(SRC_DIR, "input", filename)) as f:
+            programs[filename] = f.read()
+    programs[f"{n} ifs"] = gen_ifs(n)
+
+    for name, source_code in programs.items():
+        cfg = ast2cfg(parser.parse(source_code))
+        paths = list(gen_k_paths(cfg, k))
+
+        ts = time.perf_counter()
+        expected = [generate_test(cfg, path) is None for path in paths]
+        te = time.perf_counter()
+        print(f"{name}: {len(paths):>4} paths, generate_test {(te - ts) * 1000:8.2f}ms", end="")
+
+        get_solver_cache(cfg).clear()
+        solver = PathSolver(cfg)
+        ts = time.perf_counter()
+        infeasible = [solver.solve(path) is None for path in paths]
+        te = time.perf_counter()
+        print(f", PathSolver {(te - ts) * 1000:8.2f}ms")
+
+        assert infeasible == expected
+
+
+def bench_pruning(sizes=(6, 9, 12)):
+    """
+    Feasible paths of programs of sequential if statements testing the same
+    input, with n + 1 feasible paths out of 2 ** n: enumerated then solved,
+    and enumerated with a PathSolver as oracle.
+    """
+
+    from cfgraph.utils import gen_k_paths
+    from syntax.parser import parser
+    from tests.solver import PathSolver, get_solver_cache
+    from utils.ast2cfg import ast2cfg
+
+    for n in sizes:
+        lines = ["0: input(x);", "1: y := 0;"]
+        for i in range(n):
+            label = 2 + 2 * i
+            lines.append(f"{label}: if (x > {i}) {{ {label + 1}: y := y + 1; }}")
+        cfg = ast2cfg(parser.parse("\n".join(lines)))
+        k = 3 * n + 3
+
+        solver = PathSolver(cfg)
+        ts = time.perf_counter()
+        expected = [path for path in gen_k_paths(cfg, k) if solver.solve(path) is not None]
+        te = time.perf_counter()
+        print(f"{n:>3} ifs: enumeration {(te - ts) * 1000:10.2f}ms", end="")
+
+        get_solver_cache(cfg).clear()
+        solver = PathSolver(cfg)
+        ts = time.perf_counter()
+        paths = [path for path in gen_k_paths(cfg, k, oracle=solver.is_feasible) if solver.solve(path) is not None]
+        te = time.perf_counter()
+        print(f"   pruning {(te - ts) * 1000:10.2f}ms ({len(paths)} paths, {solver.pruned} prefixes pruned)")
+
+        assert paths == expected
+
+
+def bench_solver_cache():
+    """
+    All the criteria of tests.generator on the input programs, with solver
+    results kept across criteria, and with the cache cleared before each.
+    """
+
+    from syntax.parser import parser
+    from tests import generator
+    from tests.solver import get_solver_cache
+    from utils.ast2cfg import ast2cfg
+
+    criteria = [generator.gen_ta, generator.gen_td, lambda cfg: generator.gen_ktc(cfg, 10),
+                lambda cfg: generator.gen_itb(cfg, 1), generator.gen_tdef, generator.gen_tu, generator.gen_tdu]
+
+    for filename in ["example3.imp", "if-in-while.imp", "prime-sieve.imp", "simple-while.imp"]:
+        with open(os.path.join(SRC_DIR, "input", filename)) as f:
+            source_code = f.read()
+
+        for shared in [False, True]:
+            cfg = ast2cfg(parser.parse(source_code))
+            solver_cache = get_solver_cache(cfg)
+            queries = hits = 0
+
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    ts = time.perf_counter()
+                    for criterion in criteria:
+                        if not shared:
+                            queries += solver_cache.hits + solver_cache.misses
+                            hits += solver_cache.hits
+                            solver_cache.clear()
+                        criterion(cfg)
+                    te = time.perf_counter()
+                finally:
+                    sys.stdout = stdout
+
+            queries += solver_cache.hits + solver_cache.misses
+            hits += solver_cache.hits
+            print(f"{filename}: {'shared' if shared else 'cleared':<7} {(te - ts) * 1000:10.2f}ms, "
+                  f"{hits}/{queries} hits")
+
+
+def bench_generation(workers=(1, 2, 4)):
+    """
+    Test generation for the data flow criteria and for k-paths, serial and
+    with pools of workers.
+    """
+
+    from syntax.parser import parser
+    from tests import generator
+    from tests.solver import get_solver_cache
+    from utils.ast2cfg import ast2cfg
+
+    criteria = {"tdu": generator.gen_tdu, "tu": generator.gen_tu,
+                "ktc": lambda cfg, workers: generator.gen_ktc(cfg, 10, workers=workers)}
+
+    for filename in ["example3.imp", "prime-sieve.imp"]:
+        with open(os.path.join(SRC_DIR, "input", filename)) as f:
+            cfg = ast2cfg(parser.parse(f.read()))
+
+        for name, criterion in criteria.items():
+            times = list()
+            for count in (None,) + tuple(workers):
+                get_solver_cache(cfg).clear()
+                with open(os.devnull, "w") as devnull:
+                    stdout, sys.stdout = sys.stdout, devnull
+                    try:
+                        ts = time.perf_counter()
+                        criterion(cfg, workers=count)
+                        te = time.perf_counter()
+                    finally:
+                        sys.stdout = stdout
+                times.append(f"{'serial' if count is None else count}: {(te - ts) * 1000:.2f}ms")
+            print(f"{filename} {name}: {', '.join(times)}")
+
+
+BENCHMARKS = {
+    "imports": bench_imports,
+    "ast": bench_ast,
+    "guards": bench_guards,
+    "loops": bench_loops,
+    "cfg": bench_cfg,
+    "blocks": bench_blocks,
+    "usages": bench_usages,
+    "defref": bench_defref,
+    "dupaths": bench_dupaths,
+    "frozen": bench_frozen,
+    "cache": bench_cache,
+    "compiled": bench_compiled,
+    "batch": bench_batch,
+    "parallel": bench_parallel,
+    "paths": bench_paths,
+    "coverage": bench_coverage,
+    "solver": bench_solver,
+    "pruning": bench_pruning,
+    "solvercache": bench_solver_cache,
+    "generation": bench_generation,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        print(f"== {name} ==")
+        ts = time.time()
+        BENCHMARKS[name]()
+        print(f"{name} took {(time.time() - ts) * 1000:.2f}ms\n")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import pickle
+import sys
+
+
+CACHE_DIR = os.environ.get(
+    "IMP_CACHE_DIR",
+    os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "is3014ad"),
+)
+
+
+def get_cache_dir(*parts):
+    """
+    Returns a directory inside the cache, creating it if needed.
+
+    The root defaults to $XDG_CACHE_HOME/is3014ad and can be overridden with
+    the IMP_CACHE_DIR environment variable.
+
+    Arguments:
+        parts -- path components below the cache root
+
+    Returns:
+        path -- the directory, or None if it cannot be created
+    """
+
+    path = os.path.join(CACHE_DIR, *parts)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
+
+###############################################################################
+# Content-addressed store of programs and analyses
+
+# Upper bound on the size of the store, in bytes
+MAX_SIZE = int(os.environ.get("IMP_CACHE_SIZE", 64 * 1024 * 1024))
+
+# Sources whose changes invalidate stored entries
+TOOL_SOURCES = ["astree", "cfgraph", "syntax", os.path.join("utils", "ast2cfg.py"),
+                os.path.join("utils", "simplify.py"), os.path.join("tests", "solver.py")]
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+_tool_version = None
+
+
+def tool_version():
+    """
+    Returns a hash of the python version and of the sources building and
+    analysing programs, so that entries stored by another version of the
+    tool are never loaded.
+    """
+
+    global _tool_version
+    if _tool_version is not None:
+        return _tool_version
+
+    digest = hashlib.sha1(sys.version.encode())
+    for source in TOOL_SOURCES:
+        path = os.path.join(SRC_DIR, source)
+        if os.path.isdir(path):
+            filenames = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".py"))
+        else:
+            filenames = [path]
+        for filename in filenames:
+            with open(filename, "rb") as f:
+                digest.update(f.read())
+
+    _tool_version = digest.hexdigest()
+    return _tool_version
+
+
+def source_key(source_code):
+    """
+    Returns the cache key of a program: a hash of its source and of the tool
+    version.
+    """
+
+    return hashlib.sha1(f"{tool_version()}\0{source_code}".encode()).hexdigest()
+
+
+def load(key, name):
+    """
+    Load an entry of the store.
+
+    Arguments:
+        key  -- key of the program, see source_key
+        name -- name of the entry
+
+    Returns:
+        value -- the stored value, or None if it is missing or unreadable
+    """
+
+    store_dir = get_cache_dir("programs")
+    if store_dir is None:
+        return None
+
+    filename = os.path.join(store_dir, f"{key}.{name}.pickle")
+    try:
+        with open(filename, "rb") as f:
+            value = pickle.load(f)
+        # Keep track of the last use, for eviction
+        os.utime(filename)
+    except Exception:
+        return None
+
+    return value
+
+
+def store(key, name, value):
+    """
+    Store an entry, then evict the least recently used entries if the store
+    grew above MAX_SIZE. The file is written to a temporary name then
+    renamed, as the parser tables are. Values that cannot be pickled are
+    silently not stored.
+
+    Arguments:
+        key   -- key of the program, see source_key
+        name  -- name of the entry
+        value -- picklable value, not None
+    """
+
+    store_dir = get_cache_dir("programs")
+    if store_dir is None:
+        return
+
+    filename = os.path.join(store_dir, f"{key}.{name}.pickle")
+    tmpfile = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(tmpfile, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, filename)
+    except (OSError, pickle.PicklingError, RecursionError):
+        try:
+            os.remove(tmpfile)
+        except OSError:
+            pass
+        return
+
+    evict(store_dir, MAX_SIZE)
+
+
+def evict(store_dir, max_size):
+    """
+    Remove the least recently used entries of a directory until its size is
+    at most max_size bytes.
+    """
+
+    entries = list()
+    size = 0
+    for entry in os.scandir(store_dir):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size += stat.st_size
+
+    entries.sort()
+    for _, entry_size, path in entries:
+        if size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        size -= entry_size
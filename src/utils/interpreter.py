@@ -5,16 +5,153 @@
 import os, sys
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
 
-from syntax.parser import parser
+from astree.stmt import SAssign, SIf, SSequence, SSkip, SWhile
+from utils.loader import load_ast
+
+
+# Instructions of the execution engine are tuples (kind, a, b, c)
+BLOCK = 0       # (BLOCK, ((varname, compiled aexp), ...), None, None)
+SEQUENCE = 1    # (SEQUENCE, (instructions in reverse order), None, None)
+WHILE = 2       # (WHILE, compiled bexp, body instruction, None)
+IF = 3          # (IF, compiled bexp, true instruction, false instruction)
+STMT = 4        # (STMT, statement run with exec, None, None)
+
+
+def get_body(stmt):
+    if isinstance(stmt, SSequence):
+        return stmt.stmts
+    elif isinstance(stmt, SIf):
+        return (stmt.strue, stmt.sfalse)
+    elif isinstance(stmt, SWhile):
+        return (stmt.stmt,)
+    return ()
+
+
+def lower(ast):
+    """
+    Lower a statement into nested instructions for execute. Consecutive
+    assignments are merged into blocks run by a tight loop, and expressions
+    are compiled into closures.
+
+    The AST is traversed in post-order with an explicit stack, so that deep
+    nesting does not exhaust the Python stack.
+
+    Arguments:
+        ast -- statement to lower
+
+    Returns:
+        instruction -- the instruction of the whole statement
+    """
+
+    code = dict()
+    stack = [(ast, False)]
+
+    while stack:
+        stmt, ready = stack.pop()
+
+        if not ready:
+            stack.append((stmt, True))
+            stack.extend((child, False) for child in get_body(stmt))
+            continue
+
+        if isinstance(stmt, SAssign):
+            instruction = (BLOCK, ((stmt.var.name, stmt.aexp.compile()),), None, None)
+
+        elif isinstance(stmt, SSkip):
+            instruction = (BLOCK, (), None, None)
+
+        elif isinstance(stmt, SSequence):
+            items = list()
+            for child in stmt.stmts:
+                child_instruction = code[id(child)]
+                if child_instruction[0] == SEQUENCE:
+                    children = reversed(child_instruction[1])
+                else:
+                    children = [child_instruction]
+                for item in children:
+                    if item[0] == BLOCK and items and items[-1][0] == BLOCK:
+                        items[-1] = (BLOCK, items[-1][1] + item[1], None, None)
+                    else:
+                        items.append(item)
+            if len(items) == 1:
+                instruction = items[0]
+            else:
+                instruction = (SEQUENCE, tuple(reversed(items)), None, None)
+
+        elif isinstance(stmt, SWhile):
+            instruction = (WHILE, stmt.bexp.compile(), code[id(stmt.stmt)], None)
+
+        elif isinstance(stmt, SIf):
+            instruction = (IF, stmt.bexp.compile(), code[id(stmt.strue)], code[id(stmt.sfalse)])
+
+        else:
+            instruction = (STMT, stmt, None, None)
+
+        code[id(stmt)] = instruction
+
+    return code[id(ast)]
+
+
+def execute(ast, state, verbose=True):
+    """
+    Execute a statement on a state, with an explicit stack of instructions
+    left to run instead of recursive exec calls. Neither loop iterations nor
+    nesting grow the Python stack. Loops whose body is a block of assignments
+    run in a tight loop.
+
+    Arguments:
+        ast     -- statement to execute
+        state   -- a dict {varname: value}, updated in place
+        verbose -- whether input and print statements interact with the user
+
+    Returns:
+        state -- state after execution
+    """
+
+    stack = [lower(ast)]
+    pop = stack.pop
+    push = stack.append
+    extend = stack.extend
+
+    while stack:
+        instruction = pop()
+        kind, a, b, c = instruction
+
+        if kind == BLOCK:
+            for varname, value in a:
+                state[varname] = value(state)
+
+        elif kind == SEQUENCE:
+            extend(a)
+
+        elif kind == WHILE:
+            if b[0] == BLOCK:
+                assignments = b[1]
+                while a(state):
+                    for varname, value in assignments:
+                        state[varname] = value(state)
+            elif a(state):
+                # Run the body, then come back to the loop
+                push(instruction)
+                push(b)
+
+        elif kind == IF:
+            push(b if a(state) else c)
+
+        else:
+            # Statements without control flow: input, print
+            a.exec(state, verbose)
+
+    return state
 
 
 def interpreter(filename, init_state):
     with open(filename, 'r') as f:
         source_code = f.read()
 
-    ast = parser.parse(source_code)
+    ast = load_ast(source_code)
 
-    result = ast.exec(init_state)
+    result = execute(ast, init_state)
     print(result)
 
 
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Load programs through the on-disk cache.
+
+The simplified AST and the frozen CFG of a program are stored together under
+the hash of its source and of the tool version (see utils.cache.source_key),
+and so are the analyses later run on the CFG. On a hit, neither the parser,
+ast2cfg nor networkx is even imported.
+"""
+
+# Append parentdir to import path
+import os, sys
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+from cfgraph.frozen import freeze, thaw
+from cfgraph.utils import attach_cache
+from utils import cache
+
+
+def load_program(source_code, blocks=False):
+    """
+    Parse, simplify and build the CFG of a program, or load them from the
+    cache.
+
+    Arguments:
+        source_code -- source of the program
+        blocks      -- whether to compact the CFG into basic blocks
+
+    Returns:
+        ast -- simplified AST
+        cfg -- FrozenCFG, or networkx basic-block CFG, whose analyses are
+               cached as well
+    """
+
+    key = cache.source_key(source_code)
+
+    program = cache.load(key, "program")
+    if program is None:
+        from syntax.parser import parser
+        from utils.ast2cfg import ast2cfg
+        from utils.simplify import simplify
+
+        ast = simplify(parser.parse(source_code))
+        program = ast, freeze(ast2cfg(ast))
+        cache.store(key, "program", program)
+
+    ast, cfg = program
+
+    if blocks:
+        from utils.ast2cfg import compact_cfg
+        cfg = compact_cfg(thaw(cfg))
+        attach_cache(cfg.graph["cfg"], key)
+    else:
+        attach_cache(cfg, key)
+
+    return ast, cfg
+
+
+def load_ast(source_code):
+    """
+    Parse and simplify a program, or load its AST from the cache.
+    """
+
+    ast, _ = load_program(source_code)
+    return ast
+
+
+if __name__ == "__main__":
+    from utils.printer import print_ast
+
+    with open(sys.argv[1]) as f:
+        source_code = f.read()
+
+    ast, cfg = load_program(source_code)
+    print_ast(ast)
+    print(f"{cfg.number_of_nodes()} nodes, {cfg.number_of_edges()} edges")
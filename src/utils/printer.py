@@ -1,10 +1,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from anytree import RenderTree
-from networkx import nx
+# Rendering backends (anytree, networkx, pygraphviz) are imported in the
+# functions using them, so that importing timeit stays cheap.
 import os
-import pygraphviz
 import time
 
 def timeit(method):
@@ -22,14 +21,17 @@ def timeit(method):
 
 
 def print_ast(ast):
+    from anytree import RenderTree
     print(RenderTree(ast))
 
 
 def print_cfg(cfg):
+    import networkx as nx
     print(nx.drawing.nx_pydot.to_pydot(cfg))
 
 
 def write_cfg(cfg, filename, layout="dot"):
+    import networkx as nx
     path = "output/" + os.path.splitext(filename)[0] + f".{layout}.png"
     graph = nx.drawing.nx_agraph.to_agraph(cfg)
     graph.layout(layout)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Constant folding and algebraic simplification of ASTs.
+
+Simplified trees share unchanged subtrees with the input, which is never
+mutated. Guards reduced to a constant remove the dead branch of an if, and
+the whole of a while whose guard is false, so that neither ast2cfg nor the
+generators ever see unreachable statements.
+
+Runtime errors are kept: a division by zero is not folded, and an operand
+is only dropped when its evaluation is total (see is_total), which for a
+variable means it is definitely assigned at this point of the program.
+"""
+
+import operator
+
+# Append parentdir to import path
+import os, sys
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+from astree.aexp import *
+from astree.bexp import *
+from astree.stmt import *
+
+
+# Folding a power with a larger exponent could build huge integers
+MAX_FOLDED_EXPONENT = 64
+
+# Identities x op c == x. Not x / 1, which floors the float of a negative
+# power
+RIGHT_NEUTRAL = {
+    '+': 0,
+    '-': 0,
+    '*': 1,
+    '**': 1,
+}
+
+# Identities c op x == x
+LEFT_NEUTRAL = {
+    '+': 0,
+    '*': 1,
+}
+
+
+def is_total(exp, assigned=frozenset()):
+    """
+    Whether evaluating an expression cannot fail: it only reads variables
+    of assigned, divides by non-zero constants only, and raises to
+    non-negative constant powers only. Dead stores are stripped by the same
+    rule, see cfgraph.dataflow.get_dead_stores.
+    """
+
+    if isinstance(exp, (AVariable, BVariable)):
+        return exp.name in assigned
+    elif isinstance(exp, (AUnOp, BUnOp)):
+        return is_total(exp.child, assigned)
+    elif isinstance(exp, ABinOp):
+        if exp.op in ['/', '%'] and not (isinstance(exp.right, AConstant) and exp.right.value != 0):
+            return False
+        if exp.op == '**' and not (isinstance(exp.right, AConstant) and exp.right.value >= 0):
+            return False
+        return is_total(exp.left, assigned) and is_total(exp.right, assigned)
+    elif isinstance(exp, BBinOp):
+        return is_total(exp.left, assigned) and is_total(exp.right, assigned)
+    return True
+
+
+def get_assigned(stmt, assigned=frozenset()):
+    """
+    Returns the variables definitely assigned after a statement, given those
+    assigned before it. Input statements leave the state untouched when tests
+    run, and do not count, as in cfgraph.dataflow.get_assigned_variables.
+    """
+
+    if isinstance(stmt, SAssign):
+        return assigned | {stmt.var.name}
+    elif isinstance(stmt, SSequence):
+        for child in stmt.stmts:
+            assigned = get_assigned(child, assigned)
+        return assigned
+    elif isinstance(stmt, SIf):
+        return get_assigned(stmt.strue, assigned) & get_assigned(stmt.sfalse, assigned)
+    # The body of a while may not run
+    return assigned
+
+
+def simplify(ast):
+    """
+    Simplify a statement or an expression.
+
+    Arguments:
+        ast -- AST to simplify
+
+    Returns:
+        result -- simplified AST, SSkip() if nothing is left of a statement
+    """
+
+    if isinstance(ast, AExp):
+        return simplify_aexp(ast)
+    elif isinstance(ast, BExp):
+        return simplify_bexp(ast)
+    else:
+        return simplify_stmt(ast)
+
+
+def simplify_aexp(aexp):
+    if isinstance(aexp, AUnOp):
+        child = simplify_aexp(aexp.child)
+        if isinstance(child, AConstant):
+            return AConstant(getattr(operator, AUnOp.OPERATORS[aexp.op])(child.value))
+        if aexp.op == '+':
+            return child
+        if child is aexp.child:
+            return aexp
+        return AUnOp(aexp.op, child)
+
+    elif isinstance(aexp, ABinOp):
+        left = simplify_aexp(aexp.left)
+        right = simplify_aexp(aexp.right)
+
+        if isinstance(left, AConstant) and isinstance(right, AConstant):
+            if aexp.op in ['/', '%'] and right.value == 0:
+                # Keep the runtime error
+                pass
+            elif aexp.op == '**' and not 0 <= right.value <= MAX_FOLDED_EXPONENT:
+                pass
+            else:
+                return AConstant(getattr(operator, ABinOp.OPERATORS[aexp.op])(left.value, right.value))
+
+        if isinstance(right, AConstant) and RIGHT_NEUTRAL.get(aexp.op) == right.value:
+            return left
+        if isinstance(left, AConstant) and LEFT_NEUTRAL.get(aexp.op) == left.value:
+            return right
+
+        if left is aexp.left and right is aexp.right:
+            return aexp
+        return ABinOp(aexp.op, left, right)
+
+    else:
+        return aexp
+
+
+def simplify_bexp(bexp, assigned=frozenset()):
+    # assigned -- variables definitely assigned, see is_total
+    if isinstance(bexp, BUnOp):
+        child = simplify_bexp(bexp.child, assigned)
+        if isinstance(child, BConstant):
+            return BConstant(not child.value)
+        if isinstance(child, BUnOp) and child.op == '!':
+            return child.child
+        if child is bexp.child:
+            return bexp
+        return BUnOp(bexp.op, child)
+
+    elif isinstance(bexp, BBinOp):
+        if bexp.subtypes == "AEXP":
+            left = simplify_aexp(bexp.left)
+            right = simplify_aexp(bexp.right)
+            if isinstance(left, AConstant) and isinstance(right, AConstant):
+                return BConstant(BBinOp.OPERATORS[bexp.op](left.value, right.value))
+
+        else:
+            left = simplify_bexp(bexp.left, assigned)
+            right = simplify_bexp(bexp.right, assigned)
+            if isinstance(left, BConstant) and isinstance(right, BConstant):
+                return BConstant(BBinOp.OPERATORS[bexp.op](left.value, right.value))
+
+            for constant, other in [(left, right), (right, left)]:
+                if isinstance(constant, BConstant):
+                    # && and || short-circuit: a left operand is evaluated
+                    # whatever the right one, and only dropped if total
+                    droppable = constant is left or is_total(other, assigned)
+                    if bexp.op == '&&':
+                        if constant.value:
+                            return other
+                        if droppable:
+                            return BConstant(False)
+                    elif bexp.op == '||':
+                        if not constant.value:
+                            return other
+                        if droppable:
+                            return BConstant(True)
+                    elif bexp.op == '^':
+                        return simplify_bexp(BUnOp('!', other)) if constant.value else other
+
+        if left is bexp.left and right is bexp.right:
+            return bexp
+        return BBinOp(bexp.op, left, right)
+
+    else:
+        return bexp
+
+
+def simplify_stmt(stmt, assigned=frozenset()):
+    # assigned -- variables definitely assigned before stmt, see is_total
+    if isinstance(stmt, SAssign):
+        aexp = simplify_aexp(stmt.aexp)
+        if aexp is stmt.aexp:
+            return stmt
+        return SAssign(stmt.var, aexp, label=getattr(stmt, "label", None))
+
+    elif isinstance(stmt, SPrint):
+        aexp = simplify_aexp(stmt.child)
+        if aexp is stmt.child:
+            return stmt
+        return SPrint(aexp, label=getattr(stmt, "label", None))
+
+    elif isinstance(stmt, SSequence):
+        stmts = list()
+        for child in stmt.stmts:
+            child = simplify_stmt(child, assigned)
+            assigned = get_assigned(child, assigned)
+            if isinstance(child, SSequence):
+                stmts.extend(child.stmts)
+            elif not isinstance(child, SSkip):
+                stmts.append(child)
+
+        if not stmts:
+            return SSkip()
+        elif len(stmts) == 1:
+            return stmts[0]
+        elif len(stmts) == len(stmt.stmts) and all(new is old for new, old in zip(stmts, stmt.stmts)):
+            return stmt
+        return SSequence(*stmts)
+
+    elif isinstance(stmt, SIf):
+        bexp = simplify_bexp(stmt.bexp, assigned)
+        strue = simplify_stmt(stmt.strue, assigned)
+        sfalse = simplify_stmt(stmt.sfalse, assigned)
+
+        if isinstance(bexp, BConstant):
+            return strue if bexp.value else sfalse
+        if isinstance(strue, SSkip) and isinstance(sfalse, SSkip) and is_total(bexp, assigned):
+            # The guard has no other effect than failing
+            return strue
+
+        if bexp is stmt.bexp and strue is stmt.strue and sfalse is stmt.sfalse:
+            return stmt
+        return SIf(bexp, strue, sfalse, label=getattr(stmt, "label", None))
+
+    elif isinstance(stmt, SWhile):
+        bexp = simplify_bexp(stmt.bexp, assigned)
+        if isinstance(bexp, BConstant) and not bexp.value:
+            return SSkip()
+
+        body = simplify_stmt(stmt.stmt, assigned)
+        if bexp is stmt.bexp and body is stmt.stmt:
+            return stmt
+        return SWhile(bexp, body, label=getattr(stmt, "label", None))
+
+    else:
+        return stmt
+
+
+if __name__ == "__main__":
+    from syntax.parser import parser
+    from utils.printer import print_ast
+
+    with open(sys.argv[1]) as f:
+        source_code = f.read()
+
+    print_ast(simplify(parser.parse(source_code)))